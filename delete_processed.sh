@@ -6,3 +6,4 @@ find $DIR -type f -name "histogram*" -exec rm {} \;
 find $DIR -type f -name "processed*" -exec rm {} \;
 find $DIR -type f -name "predictions*" -exec rm {} \;
 find $DIR -type f -name "sysmon*.png" -exec rm {} \;
+find $DIR -type f -name "report.*" -exec rm {} \;
@@ -0,0 +1,466 @@
+"""
+    Firecracker Microbenchmark
+    (c) Niels Boonstra, 2020
+    File: benchmark_processing.py
+
+    Performance regression benchmarks of the processing pipeline.
+
+    Generates synthetic workload, baseline, result and sysmon files in the
+    formats of the benchmark, at several numbers of instances, and measures
+    the runtime and peak memory of every stage of the pipeline:
+        - generation        generate_poisson_workload of the generator
+        - baselines         calculate_average_baselines
+        - deltas            calculate_deltas of a sorted result file
+        - max_concurrency   max_concurrent_events
+        - histogram         concurrency_histogram, including rendering
+        - prediction        predict_workload_runtime
+        - sysmon_graphs     sysmon_graphs, including rendering
+
+    Every run is appended as one JSON line to a history file. The compare
+    command flags stages that became slower or use more memory than in a
+    stored reference run.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from os import path
+
+import numpy as np
+import pandas as pd
+
+import process_results as pr
+import workload_generator as wg
+from registry import read_manifest, baseline_arguments
+
+__PROGRAM_DESCRIPTION__ = """Benchmark the processing pipeline"""
+
+MY_LOCATION = path.dirname(path.abspath(__file__))
+
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+DEFAULT_HISTORY = path.join(MY_LOCATION, "benchmark-history.jsonl")
+DEFAULT_REFERENCE = path.join(MY_LOCATION, "benchmark-reference.json")
+# A stage regressed if it is this much slower, or uses this much more memory
+DEFAULT_THRESHOLD = 0.2
+# Differences below these are noise, whatever the ratio
+MIN_SECONDS = 0.05
+MIN_BYTES = 1024 * 1024
+
+# Arrival rate of the synthetic runs, as in the 15000 instances/hr experiments
+ARRIVALS_PER_HOUR = 15000
+SEED = 2020
+
+
+def generate_files(directory: str, n: int, seed: int = SEED) -> dict:
+    """
+    Write a synthetic workload file, baseline file, result file and sysmon
+    file of n instances to directory, using the workloads and baseline
+    arguments of the manifest. Returns the names of the files.
+    """
+    rng = np.random.default_rng(seed)
+    wid_args = baseline_arguments(read_manifest())
+    pair_wids = np.array([w for w, args in wid_args.items() for _ in args])
+    pair_args = np.array([a for args in wid_args.values() for a in args])
+    num_pairs = len(pair_wids)
+
+    # Baseline runtime of every pair, tVM is the part spent in the guest
+    pair_fc = rng.integers(500, 20000, num_pairs)
+    pair_vm = pair_fc - rng.integers(250, 400, num_pairs)
+
+    files = {
+        "workload": path.join(directory, "poisson-{}.txt".format(n)),
+        "baseline": path.join(directory, pr.BASELINES_FILENAME),
+        "results": path.join(directory, "{}poisson-{}{}".format(
+            pr.RESULTS_PREFIX, n, pr.RESULTS_EXT)),
+        "sysmon": path.join(directory, "{}poisson-{}{}".format(
+            pr.SYSMON_RESULTS_PREFIX, n, pr.SYSMON_EXT)),
+    }
+
+    # Workload file: workload ID, argument, interval to the next instance
+    idx = rng.integers(0, num_pairs, n)
+    wids = pair_wids[idx]
+    args = pair_args[idx]
+    intervals = rng.exponential(3600 / ARRIVALS_PER_HOUR, n)
+
+    pd.DataFrame({0: wids, 1: args, 2: np.round(intervals, 3)}).to_csv(
+        files["workload"], header=False, index=False)
+
+    # Baseline file: n runs spread over all pairs
+    b_idx = np.arange(n) % num_pairs
+    b_noise = rng.normal(1.0, 0.01, n)
+    pd.DataFrame({
+        pr.COLUMN_WORKLOAD: pair_wids[b_idx],
+        pr.COLUMN_ARGUMENT: pair_args[b_idx],
+        pr.COLUMN_RUN: np.arange(n) // num_pairs,
+        pr.COLUMN_TIMEFC: np.round(pair_fc[b_idx] * b_noise).astype(int),
+        pr.COLUMN_TIMEVM: np.round(pair_vm[b_idx] * b_noise).astype(int),
+    }).to_csv(files["baseline"], index=False)
+
+    # Result file: slowed down runs, start times in seconds since the epoch
+    start = 1600000000 + np.cumsum(np.append(0, intervals[:-1]))
+    slowdown = 1 + rng.exponential(0.2, n)
+    t_fc = np.round(pair_fc[idx] * slowdown).astype(int)
+    t_vm = np.round(pair_vm[idx] * slowdown).astype(int)
+    t_boot = rng.integers(100, 200, n) * 1000000
+    t_init = t_boot + rng.integers(50, 100, n) * 1000000
+    t_start = t_init + rng.integers(1, 5, n) * 1000000
+    t_end = t_start + t_vm.astype(np.int64) * 1000000
+
+    pd.DataFrame({
+        pr.COLUMN_WORKLOAD: wids,
+        pr.COLUMN_ARGUMENT: args,
+        pr.COLUMN_TIMEFC: t_fc,
+        pr.COLUMN_TIMEVM: t_vm,
+        pr.COLUMN_START: np.floor(start).astype(int),
+        pr.COLUMN_TBOOT: t_boot,
+        pr.COLUMN_TINIT: t_init,
+        pr.COLUMN_TSTART: t_start,
+        pr.COLUMN_TEND: t_end,
+        pr.COLUMN_TCPU: np.round(t_vm * 0.95).astype(int) * 1000000,
+    }).to_csv(files["results"], index=False)
+
+    # Sysmon file: one sample per second for the duration of the run
+    samples = int(start[-1] - start[0] + t_fc.max() / 1000) + 1
+    total_mem = 270332968960
+    cpu_user = rng.uniform(0, 80, samples)
+    cpu_system = rng.uniform(0, 20, samples)
+
+    with open(files["sysmon"], "w") as f:
+        f.write("#cpu_count: 64\n")
+        f.write("#total_mem: {}\n".format(total_mem))
+
+    pd.DataFrame({
+        "t": start[0] + np.arange(samples, dtype=float),
+        "cpu_user": np.round(cpu_user, 1),
+        "cpu_system": np.round(cpu_system, 1),
+        "cpu_idle": np.round(100 - cpu_user - cpu_system, 1),
+        "cpu_inter": np.round(rng.uniform(0, 2, samples), 1),
+        "cpu_percentage": np.round(cpu_user + cpu_system, 1),
+        "load_1m": np.round(rng.uniform(0, 64, samples), 2),
+        "mem_avail": total_mem - rng.integers(0, 2**32, samples),
+        "swap_used": np.zeros(samples, dtype=int),
+    }).to_csv(files["sysmon"], mode="a", index=False)
+
+    return files
+
+
+def read_results(files: dict) -> pd.DataFrame:
+    """The result file as process_file passes it to calculate_deltas"""
+    df = pr.read_csv(files["results"])
+    df.sort_values(by=pr.COLUMN_START, inplace=True)
+    df[pr.COLUMN_START] = (df[pr.COLUMN_START]
+                           - df[pr.COLUMN_START].min()) * 1000
+    return df
+
+
+def processed_results(files: dict, baselines: dict) -> pd.DataFrame:
+    return pr.calculate_deltas(read_results(files), baselines)
+
+
+# Every stage prepares its input outside of the measurement and returns the
+# call to measure
+def stage_generation(files: dict, n: int, baselines: dict, directory: str):
+    wid_args = baseline_arguments(read_manifest())
+    mix = [1 / len(wid_args) for _ in wid_args]
+    return lambda: wg.generate_poisson_workload(
+        wid_args, mix, n, n / ARRIVALS_PER_HOUR)
+
+
+def stage_baselines(files: dict, n: int, baselines: dict, directory: str):
+    return lambda: pr.calculate_average_baselines(files=[files["baseline"]])
+
+
+def stage_deltas(files: dict, n: int, baselines: dict, directory: str):
+    df = read_results(files)
+    return lambda: pr.calculate_deltas(df, baselines)
+
+
+def stage_max_concurrency(files: dict, n: int, baselines: dict,
+                          directory: str):
+    df = processed_results(files, baselines)
+    return lambda: pr.max_concurrent_events(df)
+
+
+def stage_histogram(files: dict, n: int, baselines: dict, directory: str):
+    df = processed_results(files, baselines)
+    df_pred = pr.predict_workload_runtime(files["workload"], baselines)
+    output = path.join(directory, "histogram.png")
+    return lambda: pr.concurrency_histogram(df, df_pred, output=output,
+                                            bin_size=20000)
+
+
+def stage_prediction(files: dict, n: int, baselines: dict, directory: str):
+    return lambda: pr.predict_workload_runtime(files["workload"], baselines)
+
+
+def stage_sysmon_graphs(files: dict, n: int, baselines: dict,
+                        directory: str):
+    df = pr.read_csv(files["sysmon"])
+    output = path.join(directory, "sysmon.png")
+    return lambda: pr.sysmon_graphs(df, output=output,
+                                    total_mem=270332968960)
+
+
+# Stage: (function, largest number of instances it runs at by default).
+# Stages that scale quadratically would not finish at the larger sizes.
+STAGES = {
+    "generation": (stage_generation, None),
+    "baselines": (stage_baselines, None),
+    "deltas": (stage_deltas, None),
+    "max_concurrency": (stage_max_concurrency, 10000),
+    "histogram": (stage_histogram, None),
+    "prediction": (stage_prediction, None),
+    "sysmon_graphs": (stage_sysmon_graphs, None),
+}
+
+
+@contextlib.contextmanager
+def quiet(enabled: bool = True):
+    """Hide the progress output of the pipeline"""
+    if not enabled:
+        yield
+        return
+
+    with open(os.devnull, "w") as devnull:
+        with contextlib.redirect_stdout(devnull), \
+                contextlib.redirect_stderr(devnull):
+            yield
+
+
+def measure(stage, files: dict, n: int, baselines: dict, directory: str,
+            repeat: int = 1, memory: bool = True) -> dict:
+    """
+    Run a stage repeat times and return the fastest runtime in seconds. If
+    memory is set, run it once more with tracemalloc to get the peak of the
+    memory allocated by the stage, which includes numpy and pandas buffers.
+    """
+    timings = []
+
+    for _ in range(repeat):
+        call = stage(files, n, baselines, directory)
+        t = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - t)
+
+    result = {"seconds": min(timings)}
+
+    if memory:
+        call = stage(files, n, baselines, directory)
+        tracemalloc.start()
+        try:
+            call()
+            result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return result
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              cwd=MY_LOCATION, stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, check=True,
+                              universal_newlines=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def run_benchmarks(sizes: list, stages: list, repeat: int = 1,
+                   memory: bool = True, no_limits: bool = False,
+                   workdir: str = "", verbose: bool = False) -> dict:
+    """Run the stages at every size and return the run as a dictionary"""
+    run = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": git_commit(),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "results": [],
+    }
+
+    for n in sizes:
+        directory = tempfile.mkdtemp(prefix="bench-{}-".format(n),
+                                     dir=workdir or None)
+        try:
+            pr.err("Generating {} instances in {}".format(n, directory))
+            files = generate_files(directory, n)
+            baselines = pr.calculate_baselines(pr.read_csv(files["baseline"]))
+
+            for name in stages:
+                stage, limit = STAGES[name]
+                entry = {"stage": name, "instances": n}
+
+                if limit is not None and n > limit and not no_limits:
+                    pr.err("{:>16} {:>8}: skipped, limit is {}".format(
+                        name, n, limit))
+                    entry["skipped"] = True
+                    run["results"].append(entry)
+                    continue
+
+                with quiet(not verbose):
+                    entry.update(measure(stage, files, n, baselines,
+                                         directory, repeat, memory))
+
+                pr.err("{:>16} {:>8}: {:10.3f} s {:>12}".format(
+                    name, n, entry["seconds"],
+                    format_bytes(entry.get("peak_bytes"))))
+                run["results"].append(entry)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    return run
+
+
+def format_bytes(value) -> str:
+    if value is None:
+        return ""
+
+    for unit in ("B", "KiB", "MiB"):
+        if value < 1024:
+            return "{:.1f} {}".format(value, unit)
+        value /= 1024
+
+    return "{:.1f} GiB".format(value)
+
+
+def read_history(filename: str) -> list:
+    if not path.isfile(filename):
+        raise ValueError("{} is not a file, or does not exist".format(filename))
+
+    with open(filename, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare_runs(run: dict, reference: dict,
+                 threshold: float = DEFAULT_THRESHOLD) -> list:
+    """
+    Compare the measurements of a run with a reference run. Returns a list of
+    (stage, instances, metric, reference value, value, ratio) of every
+    measurement that is more than threshold worse than the reference.
+    """
+    ref = {(r["stage"], r["instances"]): r for r in reference["results"]}
+    regressions = []
+
+    for r in run["results"]:
+        old = ref.get((r["stage"], r["instances"]))
+        if old is None:
+            continue
+
+        for metric, noise in (("seconds", MIN_SECONDS),
+                              ("peak_bytes", MIN_BYTES)):
+            if metric not in r or metric not in old:
+                continue
+
+            if r[metric] - old[metric] < noise:
+                continue
+
+            ratio = r[metric] / old[metric] if old[metric] else float("inf")
+            if ratio > 1 + threshold:
+                regressions.append((r["stage"], r["instances"], metric,
+                                    old[metric], r[metric], ratio))
+
+    return regressions
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__PROGRAM_DESCRIPTION__)
+    commands = arg_parser.add_subparsers(dest="command")
+
+    run_parser = commands.add_parser("run", help="Run the benchmarks and append them to the history")
+    run_parser.add_argument("-s", "--sizes", type=str, default=",".join(str(s) for s in DEFAULT_SIZES),
+                            help="Comma separated numbers of instances")
+    run_parser.add_argument("-S", "--stages", type=str, default=",".join(STAGES.keys()),
+                            help="Comma separated stages to run")
+    run_parser.add_argument("-r", "--repeat", type=int, default=1,
+                            help="Runs per stage, the fastest one is stored")
+    run_parser.add_argument("--no-memory", default=False, action="store_true",
+                            help="Do not measure the peak memory, which runs every stage once more")
+    run_parser.add_argument("--no-limits", default=False, action="store_true",
+                            help="Also run quadratic stages at sizes above their limit")
+    run_parser.add_argument("-w", "--workdir", type=str, default="",
+                            help="Directory for the synthetic files, defaults to the system temp directory")
+    run_parser.add_argument("-H", "--history", type=str, default=DEFAULT_HISTORY,
+                            help="History file the run is appended to")
+    run_parser.add_argument("-v", "--verbose", default=False, action="store_true",
+                            help="Show the output of the pipeline")
+
+    ref_parser = commands.add_parser("reference", help="Store a run of the history as the reference")
+    ref_parser.add_argument("-H", "--history", type=str, default=DEFAULT_HISTORY)
+    ref_parser.add_argument("-R", "--reference", type=str, default=DEFAULT_REFERENCE)
+    ref_parser.add_argument("-i", "--index", type=int, default=-1,
+                            help="Index of the run in the history, defaults to the last run")
+
+    cmp_parser = commands.add_parser("compare", help="Compare a run of the history with the reference, exits with 1 on regressions")
+    cmp_parser.add_argument("-H", "--history", type=str, default=DEFAULT_HISTORY)
+    cmp_parser.add_argument("-R", "--reference", type=str, default=DEFAULT_REFERENCE)
+    cmp_parser.add_argument("-i", "--index", type=int, default=-1,
+                            help="Index of the run in the history, defaults to the last run")
+    cmp_parser.add_argument("-t", "--threshold", type=float, default=DEFAULT_THRESHOLD,
+                            help="Relative increase that counts as a regression")
+
+    args = arg_parser.parse_args()
+
+    if args.command == "run":
+        sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+        stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+
+        for s in stages:
+            if s not in STAGES:
+                arg_parser.error("unknown stage {}, choose from {}".format(
+                    s, ", ".join(STAGES.keys())))
+
+        run = run_benchmarks(sizes, stages, args.repeat, not args.no_memory,
+                             args.no_limits, args.workdir, args.verbose)
+
+        with open(args.history, "a") as f:
+            f.write(json.dumps(run) + "\n")
+
+        pr.err("Appended run to {}".format(args.history))
+
+    elif args.command == "reference":
+        run = read_history(args.history)[args.index]
+
+        with open(args.reference, "w") as f:
+            json.dump(run, f, indent=1)
+
+        pr.err("Stored run of {} ({}) as reference in {}".format(
+            run["time"], run["commit"], args.reference))
+
+    elif args.command == "compare":
+        run = read_history(args.history)[args.index]
+
+        with open(args.reference, "r") as f:
+            reference = json.load(f)
+
+        regressions = compare_runs(run, reference, args.threshold)
+
+        print("Run {} ({}) against reference {} ({})".format(
+            run["time"], run["commit"], reference["time"],
+            reference["commit"]))
+
+        for stage, n, metric, old, new, ratio in regressions:
+            if metric == "peak_bytes":
+                old, new = format_bytes(old), format_bytes(new)
+            else:
+                old, new = "{:.3f} s".format(old), "{:.3f} s".format(new)
+
+            print("REGRESSION {:>16} {:>8} {:>10}: {} -> {} ({:+.0%})".format(
+                stage, n, metric, old, new, ratio - 1))
+
+        if regressions:
+            exit(1)
+
+        print("No regressions")
+
+    else:
+        arg_parser.print_help()
+        exit(-1)
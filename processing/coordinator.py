@@ -0,0 +1,398 @@
+"""
+    Firecracker Microbenchmark
+    (c) Niels Boonstra, 2020
+    File: coordinator.py
+
+    Run one workload-argument file on several hosts.
+
+    The coordinator turns the intervals of the workload into arrival times and
+    deals the instances round-robin to the agents, so every agent receives a
+    time-ordered shard and the arrivals of all agents together keep the
+    Poisson timing of the workload. Agents launch their instances at the
+    planned times and stream the results back, which the coordinator merges
+    into a single results file with the host of every instance.
+
+    Protocol, one line per message over TCP:
+        agent:       hello <host>
+        coordinator: ping <t>                  repeated to estimate the clock
+        agent:       pong <t> <agent time>     offset of the agent
+        coordinator: shard <n>, followed by n lines <id>, <workloadID>,
+                     <argument>, <offset in s>
+        coordinator: start <agent time>        time of offset 0, agent clock
+        agent:       result <id>, <workloadID>, <argument>, <tFC>, <tVM>,
+                     <start time>, <telemetry>, <metrics>, one per
+                     finished instance
+        agent:       done <n> <p99 lateness>
+
+    For testing, --spawn starts local agents, which can run the stub launcher
+    (FC_LAUNCHER) and a skewed clock (--clock-skew).
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from os import path
+
+import numpy as np
+
+import process_results as pr
+from registry import DEFAULT_MANIFEST, read_manifest
+
+__PROGRAM_DESCRIPTION__ = """Run a workload on several hosts"""
+
+MY_LOCATION = path.dirname(path.abspath(__file__))
+
+DEFAULT_LAUNCHER = path.abspath(path.join(MY_LOCATION, "../scripts/launch-firecracker.sh"))
+RESULTS_DIR = path.abspath(path.join(MY_LOCATION, "../results"))
+DEFAULT_PORT = 9200
+# Clock offset estimates per agent, the one with the lowest round trip is used
+PINGS = 16
+# Time between sending the shards and the first arrival
+START_DELAY = 2.0
+# Instances an agent runs at the same time, later arrivals wait for a worker
+DEFAULT_WORKERS = 1024
+
+TELEMETRY_FIELDS = ("boot", "init", "start", "end", "cpu")
+COLUMN_HOST = "host"
+RESULTS_HEADER = ", ".join([pr.COLUMN_WORKLOAD, pr.COLUMN_ARGUMENT,
+                            pr.COLUMN_TIMEFC, pr.COLUMN_TIMEVM,
+                            pr.COLUMN_START, pr.COLUMN_TBOOT, pr.COLUMN_TINIT,
+                            pr.COLUMN_TSTART, pr.COLUMN_TEND, pr.COLUMN_TCPU]
+                           + list(pr.METRIC_COLUMNS)
+                           + [pr.COLUMN_INSTANCE, COLUMN_HOST])
+
+
+def read_workload(filename: str) -> list:
+    """
+    Read a workload-argument file and return (workload ID, argument, arrival)
+    of every instance, with the arrival in seconds after the first one. As in
+    benchmark.sh, an instance is followed by its interval.
+    """
+    instances = []
+    arrival = 0.0
+
+    with open(filename, "r") as f:
+        for line in f:
+            split = [s.strip() for s in line.split(",")]
+            if len(split) < 2 or not split[0].isnumeric():
+                continue
+
+            instances.append((int(split[0]), int(split[1]), arrival))
+
+            if len(split) > 2 and split[2]:
+                arrival += float(split[2])
+
+    return instances
+
+
+def split_shards(instances: list, num_agents: int) -> list:
+    """Deal the instances round-robin, keeping the ID of every instance"""
+    shards = [[] for _ in range(num_agents)]
+
+    for i, instance in enumerate(instances):
+        shards[i % num_agents].append((i,) + instance)
+
+    return shards
+
+
+class AgentConnection:
+    """The coordinator side of an agent"""
+
+    def __init__(self, conn: socket.socket):
+        self.conn = conn
+        self.file = conn.makefile("rw", buffering=1)
+        self.host = ""
+        self.offset = 0.0
+        self.rtt = 0.0
+        self.results = 0
+        self.lateness = float("nan")
+
+    def send(self, line: str) -> None:
+        self.file.write(line + "\n")
+
+    def receive(self) -> str:
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError("agent {} disconnected".format(self.host))
+        return line.strip()
+
+    def hello(self) -> None:
+        split = self.receive().split()
+        if len(split) != 2 or split[0] != "hello":
+            raise ConnectionError("expected hello, got {}".format(split))
+        self.host = split[1]
+
+    def estimate_offset(self) -> None:
+        """NTP-like estimate of agent clock - coordinator clock"""
+        samples = []
+
+        for _ in range(PINGS):
+            t0 = time.time()
+            self.send("ping {:.6f}".format(t0))
+            split = self.receive().split()
+            t1 = time.time()
+
+            if len(split) != 3 or split[0] != "pong":
+                raise ConnectionError("expected pong, got {}".format(split))
+
+            samples.append((t1 - t0, float(split[2]) - (t0 + t1) / 2))
+
+        self.rtt, self.offset = min(samples)
+
+    def send_shard(self, shard: list) -> None:
+        self.send("shard {}".format(len(shard)))
+        for iid, wid, arg, arrival in shard:
+            self.send("{}, {}, {}, {:.6f}".format(iid, wid, arg, arrival))
+
+
+def coordinate(workload: str, num_agents: int, output: str, listen: tuple,
+               spawn: list = None) -> None:
+    """Run the workload on num_agents agents. The commands in spawn are
+    started as local agents once the coordinator listens."""
+    instances = read_workload(workload)
+    shards = split_shards(instances, num_agents)
+
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(listen)
+    server.listen()
+
+    pr.err("Waiting for {} agents on {}:{}".format(num_agents, *listen))
+
+    spawned = [subprocess.Popen(command) for command in spawn or []]
+
+    agents = []
+    while len(agents) < num_agents:
+        conn, address = server.accept()
+        agent = AgentConnection(conn)
+        agent.hello()
+
+        if agent.host in [a.host for a in agents]:
+            pr.err("Agent {} is already connected, rejected".format(agent.host))
+            conn.close()
+            continue
+
+        agent.estimate_offset()
+        agents.append(agent)
+        pr.err("Agent {} from {}: clock offset {:+.6f} s, rtt {:.6f} s".format(
+            agent.host, address[0], agent.offset, agent.rtt))
+
+    server.close()
+
+    for agent, shard in zip(agents, shards):
+        agent.send_shard(shard)
+
+    start = time.time() + START_DELAY
+    for agent in agents:
+        agent.send("start {:.6f}".format(start + agent.offset))
+
+    pr.err("Started {} instances on {} agents".format(len(instances),
+                                                      num_agents))
+
+    lock = threading.Lock()
+
+    with open(output, "w") as f:
+        for agent in agents:
+            f.write("# Host {}: clock offset {:.6f} rtt {:.6f} \n".format(
+                agent.host, agent.offset, agent.rtt))
+        f.write(RESULTS_HEADER + "\n")
+        f.flush()
+
+        def collect(agent):
+            try:
+                while True:
+                    line = agent.receive()
+
+                    if line.startswith("done"):
+                        split = line.split()
+                        agent.lateness = float(split[2])
+                        break
+
+                    if not line.startswith("result "):
+                        pr.err("{}: unknown message {}".format(agent.host,
+                                                               line))
+                        continue
+
+                    split = [s.strip() for s in line[len("result "):].split(",")]
+                    # Start time to the clock of the coordinator
+                    split[5] = "{:.3f}".format(float(split[5]) - agent.offset)
+
+                    with lock:
+                        f.write(", ".join(split[1:] + split[:1] + [agent.host])
+                                + "\n")
+                        f.flush()
+                        agent.results += 1
+            except ConnectionError as e:
+                pr.err(str(e))
+
+        threads = [threading.Thread(target=collect, args=(agent,))
+                   for agent in agents]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    for agent in agents:
+        pr.err("Agent {}: {} results, p99 lateness {:.3f} s".format(
+            agent.host, agent.results, agent.lateness))
+        agent.conn.close()
+
+    for p in spawned:
+        p.wait()
+
+    pr.err("Results placed in {}".format(output))
+
+
+def parse_launch_output(output: str) -> dict:
+    """key: value lines of launch-firecracker.sh, see read_launch_output"""
+    res = {}
+
+    for line in output.splitlines():
+        key, sep, value = line.partition(": ")
+        if sep and key and " " not in key:
+            res[key] = value.strip()
+
+    return res
+
+
+def record_csv(record: str, fields: tuple) -> str:
+    """Values of a "name=value ..." record in the order of fields, see
+    record_csv in commands.sh"""
+    values = dict(f.split("=", 1) for f in record.split() if "=" in f)
+    return ", ".join(values.get(f, "") for f in fields)
+
+
+def agent(connect: tuple, host: str, kernel: str, rootfs: str,
+          manifest: str, clock_skew: float = 0.0,
+          workers: int = DEFAULT_WORKERS) -> None:
+    """Connect to the coordinator, run the shard and stream the results. At
+    most workers instances run at the same time, the lateness of an instance
+    is measured when a worker launches it."""
+    def now():
+        return time.time() + clock_skew
+
+    registry = read_manifest(manifest)
+    launcher = os.environ.get("FC_LAUNCHER", DEFAULT_LAUNCHER)
+
+    conn = socket.create_connection(connect)
+    f = conn.makefile("rw", buffering=1)
+    lock = threading.Lock()
+
+    def send(line):
+        with lock:
+            f.write(line + "\n")
+
+    send("hello {}".format(host))
+
+    shard = []
+    start = None
+    while start is None:
+        split = f.readline().split()
+        if not split:
+            raise ConnectionError("coordinator disconnected")
+
+        if split[0] == "ping":
+            send("pong {} {:.6f}".format(split[1], now()))
+        elif split[0] == "shard":
+            for _ in range(int(split[1])):
+                iid, wid, arg, arrival = [s.strip() for s in
+                                          f.readline().split(",")]
+                shard.append((int(iid), int(wid), int(arg), float(arrival)))
+        elif split[0] == "start":
+            start = float(split[1])
+
+    pr.err("{}: {} instances".format(host, len(shard)))
+
+    lateness = []
+
+    def run_instance(iid, wid, arg, planned):
+        started = now()
+        lateness.append(max(0.0, started - planned))
+        name = registry.get(wid, {}).get("name", "")
+        output = subprocess.run([launcher, kernel, rootfs, str(iid), name,
+                                 str(arg), "t"], stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL,
+                                universal_newlines=True).stdout
+        res = parse_launch_output(output)
+        send("result {}, {}, {}, {}, {}, {:.3f}, {}, {}".format(
+            iid, wid, arg, res.get("fc", ""), res.get("mVM", ""), started,
+            record_csv(res.get("telemetry", ""), TELEMETRY_FIELDS),
+            record_csv(res.get("metrics", ""), pr.METRIC_COLUMNS)))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for iid, wid, arg, arrival in shard:
+            delay = start + arrival - now()
+            if delay > 0:
+                time.sleep(delay)
+
+            pool.submit(run_instance, iid, wid, arg, start + arrival)
+
+    send("done {} {:.6f}".format(len(shard), float(np.percentile(lateness, 99))
+                                 if lateness else 0.0))
+    conn.close()
+
+
+def parse_address(raw: str) -> tuple:
+    host, _, port = raw.rpartition(":")
+    return (host or "127.0.0.1", int(port))
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__PROGRAM_DESCRIPTION__)
+    commands = arg_parser.add_subparsers(dest="command")
+
+    run_parser = commands.add_parser("run", help="Split a workload over agents and merge their results")
+    run_parser.add_argument("workload", type=str, help="Workload-argument file, with Poisson intervals")
+    run_parser.add_argument("-a", "--agents", type=int, default=2, help="Number of agents")
+    run_parser.add_argument("-l", "--listen", type=str, default="0.0.0.0:{}".format(DEFAULT_PORT),
+                            help="Address the agents connect to")
+    run_parser.add_argument("-o", "--output", type=str, default="",
+                            help="Results file, default: results/results-<workload>")
+    run_parser.add_argument("--spawn", default=False, action="store_true",
+                            help="Start the agents as local processes, for testing")
+    run_parser.add_argument("--clock-skew", type=float, default=0.0,
+                            help="Spawned agent i runs with its clock i times this many seconds ahead, for testing")
+
+    agent_parser = commands.add_parser("agent", help="Run the instances a coordinator sends")
+    agent_parser.add_argument("-c", "--connect", type=str, default="127.0.0.1:{}".format(DEFAULT_PORT),
+                              help="Address of the coordinator")
+    agent_parser.add_argument("--host", type=str, default=socket.gethostname(),
+                              help="Host ID in the results")
+    agent_parser.add_argument("-k", "--kernel", type=str, default=path.join(MY_LOCATION, "../resources/vmlinux"))
+    agent_parser.add_argument("-f", "--rootfs", type=str, default=path.join(MY_LOCATION, "../resources/rootfs.ext4"))
+    agent_parser.add_argument("-w", "--workloads", type=str, default=DEFAULT_MANIFEST,
+                              help="Workload manifest")
+    agent_parser.add_argument("-j", "--workers", type=int, default=DEFAULT_WORKERS,
+                              help="Maximal number of instances running at the same time")
+    agent_parser.add_argument("--clock-skew", type=float, default=0.0,
+                              help="Run with the clock this many seconds ahead, for testing")
+
+    args = arg_parser.parse_args()
+
+    if args.command == "run":
+        output = args.output or path.join(
+            RESULTS_DIR, pr.RESULTS_PREFIX + path.basename(args.workload))
+        listen = parse_address(args.listen)
+
+        spawn = []
+        if args.spawn:
+            spawn = [[sys.executable, path.abspath(__file__), "agent",
+                      "--connect", "127.0.0.1:{}".format(listen[1]),
+                      "--host", "local{}".format(i),
+                      "--clock-skew", str(i * args.clock_skew)]
+                     for i in range(args.agents)]
+
+        coordinate(args.workload, args.agents, output, listen, spawn)
+
+    elif args.command == "agent":
+        agent(parse_address(args.connect), args.host, args.kernel,
+              args.rootfs, args.workloads, args.clock_skew, args.workers)
+
+    else:
+        arg_parser.print_help()
+        exit(-1)
@@ -0,0 +1,275 @@
+"""
+    Firecracker Microbenchmark
+    (c) Niels Boonstra, 2020
+    File: live_metrics.py
+
+    Expose live counters of a running benchmark in the Prometheus text format,
+    either on a localhost port or on a Unix socket.
+
+    The benchmark writes one event per line to a FIFO:
+        scheduled <id> <epoch> <interval>   instance is handed to a subshell,
+                                            <interval> is the planned time
+                                            until the next instance
+        started <id>                        the microVM is launched
+        completed <id> <tFC> <tVM>          the microVM finished (ms)
+        failed <id>                         the microVM did not report times
+
+    Every event is processed in constant time. Percentiles are calculated over
+    a rolling window, from histograms with logarithmic buckets.
+"""
+
+import argparse
+import math
+import os
+import socketserver
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+__PROGRAM_DESCRIPTION__ = """Expose live metrics of a benchmark run"""
+
+QUANTILES = (0.5, 0.9, 0.99)
+# Buckets per doubling of the value, 4 gives at most ~19% error
+BUCKETS_PER_OCTAVE = 4
+# Values up to 2^24 ms (4.6 hours) get their own bucket
+NUM_BUCKETS = 24 * BUCKETS_PER_OCTAVE + 1
+
+
+class RollingHistogram:
+    """Histogram over the last window_size seconds, split in num_slots slots.
+    Adding a value is O(1), expired slots are cleared lazily."""
+
+    def __init__(self, window_size: float = 60.0, num_slots: int = 6):
+        self.slot_size = window_size / num_slots
+        self.slots = [[0] * NUM_BUCKETS for _ in range(num_slots)]
+        self.slot_ids = [-1] * num_slots
+        self.count = 0
+        self.sum = 0.0
+
+    @staticmethod
+    def bucket(value: float) -> int:
+        if value <= 1:
+            return 0
+        return min(int(math.log2(value) * BUCKETS_PER_OCTAVE) + 1,
+                   NUM_BUCKETS - 1)
+
+    @staticmethod
+    def bucket_value(bucket: int) -> float:
+        """Upper bound of a bucket"""
+        return 2 ** (bucket / BUCKETS_PER_OCTAVE)
+
+    def _slot(self, now: float) -> list:
+        slot_id = int(now / self.slot_size)
+        idx = slot_id % len(self.slots)
+
+        if self.slot_ids[idx] != slot_id:
+            self.slots[idx] = [0] * NUM_BUCKETS
+            self.slot_ids[idx] = slot_id
+
+        return self.slots[idx]
+
+    def add(self, value: float, now: float = None) -> None:
+        now = time.time() if now is None else now
+        self._slot(now)[self.bucket(value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantiles(self, quantiles: tuple, now: float = None) -> list:
+        now = time.time() if now is None else now
+        oldest = int(now / self.slot_size) - len(self.slots) + 1
+
+        merged = [0] * NUM_BUCKETS
+        for slot_id, slot in zip(self.slot_ids, self.slots):
+            if slot_id >= oldest:
+                merged = [m + s for m, s in zip(merged, slot)]
+
+        total = sum(merged)
+        if total == 0:
+            return [float("nan") for _ in quantiles]
+
+        ret = []
+        for q in quantiles:
+            rank = q * total
+            seen = 0
+            for bucket, count in enumerate(merged):
+                seen += count
+                if seen >= rank:
+                    ret.append(self.bucket_value(bucket))
+                    break
+
+        return ret
+
+
+class BenchmarkMetrics:
+    """Counters of a benchmark run, updated by the events of the benchmark"""
+
+    def __init__(self, window_size: float = 60.0):
+        self.lock = threading.Lock()
+        self.scheduled = 0
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.first_arrival = None
+        self.planned_offset = 0.0
+        self.last_lateness = 0.0
+        self.lateness = RollingHistogram(window_size)
+        self.tfc = RollingHistogram(window_size)
+        self.tvm = RollingHistogram(window_size)
+
+    def event(self, line: str) -> None:
+        split = line.split()
+        if not split:
+            return
+
+        with self.lock:
+            if split[0] == "scheduled" and len(split) >= 4:
+                epoch = float(split[2])
+                if self.first_arrival is None:
+                    self.first_arrival = epoch
+                # How much later than planned the instance was handed over
+                self.last_lateness = max(
+                    0.0, epoch - self.first_arrival - self.planned_offset)
+                self.lateness.add(self.last_lateness * 1000)
+                self.planned_offset += float(split[3])
+                self.scheduled += 1
+            elif split[0] == "started":
+                self.started += 1
+            elif split[0] == "completed" and len(split) >= 4:
+                self.completed += 1
+                self.tfc.add(float(split[2]))
+                self.tvm.add(float(split[3]))
+            elif split[0] == "failed":
+                self.failed += 1
+            else:
+                print(f"Unknown event: {line}", file=sys.stderr)
+
+    def exposition(self) -> str:
+        """Metrics in the Prometheus text format"""
+        lines = []
+
+        def metric(name, kind, help_text, value, labels=""):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name}{labels} {value}")
+
+        def summary(name, help_text, histogram, scale=1.0):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} summary")
+            for q, v in zip(QUANTILES, histogram.quantiles(QUANTILES)):
+                lines.append(f'{name}{{quantile="{q}"}} {v * scale}')
+            lines.append(f"{name}_sum {histogram.sum * scale}")
+            lines.append(f"{name}_count {histogram.count}")
+
+        with self.lock:
+            metric("fc_instances_scheduled_total", "counter",
+                   "Instances handed over to a subshell", self.scheduled)
+            metric("fc_instances_started_total", "counter",
+                   "Instances whose microVM was launched", self.started)
+            metric("fc_instances_completed_total", "counter",
+                   "Instances that finished and reported their times",
+                   self.completed)
+            metric("fc_instances_failed_total", "counter",
+                   "Instances that finished without reporting their times",
+                   self.failed)
+            metric("fc_instances_live", "gauge", "Running microVMs",
+                   self.started - self.completed - self.failed)
+            metric("fc_arrival_lateness_last_seconds", "gauge",
+                   "Lateness of the last arrival", self.last_lateness)
+            summary("fc_arrival_lateness_seconds",
+                    "Lateness of arrivals compared to the planned arrival",
+                    self.lateness, scale=0.001)
+            summary("fc_tfc_milliseconds", "Runtime of the microVMs",
+                    self.tfc)
+            summary("fc_tvm_milliseconds",
+                    "Runtime of the workloads in the microVMs", self.tvm)
+
+        return "\n".join(lines) + "\n"
+
+
+def make_handler(metrics: BenchmarkMetrics):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = metrics.exposition().encode()
+            self.send_response(200)
+            self.send_header("Content-Type",
+                             "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Do not print every scrape, Unix sockets have no client address
+            pass
+
+    return MetricsHandler
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn,
+                              socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class ThreadingTCPHTTPServer(socketserver.ThreadingMixIn,
+                             socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def open_events(fifo: str) -> int:
+    """Open the FIFO for writing as well, so that it does not reach EOF when a
+    writer closes it, and the benchmark never waits for a reader to open it"""
+    if not os.path.exists(fifo):
+        os.mkfifo(fifo)
+
+    return os.open(fifo, os.O_RDWR)
+
+
+def read_events(fd: int, metrics: BenchmarkMetrics) -> None:
+    """Read events from the opened FIFO until interrupted"""
+    with os.fdopen(fd, "r") as events:
+        for line in events:
+            try:
+                metrics.event(line)
+            except ValueError:
+                print(f"Malformed event: {line}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__PROGRAM_DESCRIPTION__)
+
+    arg_parser.add_argument("-f", "--fifo", required=True, type=str,
+                            help="FIFO the benchmark writes its events to, created if it does not exist")
+    arg_parser.add_argument("-l", "--listen", default="9101", type=str,
+                            help="Port on localhost, or path of a Unix socket, to serve the metrics on")
+    arg_parser.add_argument("-w", "--window", default=60.0, type=float,
+                            help="Window of the percentiles in seconds")
+
+    args = arg_parser.parse_args()
+
+    # Before binding, which may fail
+    events = open_events(args.fifo)
+    metrics = BenchmarkMetrics(args.window)
+
+    if args.listen.isnumeric():
+        server = ThreadingTCPHTTPServer(("127.0.0.1", int(args.listen)),
+                                        make_handler(metrics))
+    else:
+        if os.path.exists(args.listen):
+            os.unlink(args.listen)
+        server = ThreadingUnixHTTPServer(args.listen, make_handler(metrics))
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    print(f"Serving live metrics on {args.listen}", file=sys.stderr)
+
+    try:
+        read_events(events, metrics)
+    except KeyboardInterrupt:
+        print("Received interrupt, exiting...", file=sys.stderr)
+
+    server.shutdown()
+    if not args.listen.isnumeric():
+        os.unlink(args.listen)
+
+    print("Live metrics exiting", file=sys.stderr)
@@ -15,11 +15,13 @@
 
 import sys
 import argparse
+import numpy as np
 import pandas as pd
 import matplotlib as mpl
-import matplotlib.pyplot as plt
 from os import path, listdir
 
+import render
+
 from pandas.core.algorithms import isin
 
 # Do not open windows for all plots
@@ -40,6 +42,10 @@ _PROGRAM_DESCRIPTION_ = ("Process a folder containing results.\n"
 MY_LOCATION = path.dirname(path.abspath(__file__))
 
 WORKLOAD_DIR = path.abspath(path.join(MY_LOCATION, "../workloads"))
+# The workload registry lives next to the workload generator
+sys.path.append(WORKLOAD_DIR)
+from registry import DEFAULT_MANIFEST, read_manifest, workload_label, workload_class  # noqa: E402
+
 PREDICTION_PREFIX = "predictions-"
 RESULTS_PREFIX = "results-"
 RESULTS_EXT = ".txt"
@@ -49,6 +55,9 @@ BASELINE_FILENAME = "baseline.txt"
 BASELINES_FILENAME = "baselines.txt"
 HISTO_PREFIX = "histogram-"
 HISTO_EXT = ".png"
+REPORT_PREFIX = "report."
+# Firecracker metrics per instance, written by vmm_metrics.py
+VMM_PREFIX = "vmm-"
 # Header names
 COLUMN_WORKLOAD = "workloadID"
 COLUMN_ARGUMENT = "workload argument"
@@ -60,6 +69,28 @@ COLUMN_END = "end time"
 COLUMN_PREDICT_END = "pred. end time"
 COLUMN_DELTA_FC = "d tFC"
 COLUMN_DELTA_VM = "d tVM"
+COLUMN_LABEL = "workload"
+COLUMN_CLASS = "class"
+# Guest telemetry, monotonic nanoseconds since the guest kernel started
+COLUMN_TBOOT = "tBoot"
+COLUMN_TINIT = "tInit"
+COLUMN_TSTART = "tStart"
+COLUMN_TEND = "tEnd"
+COLUMN_TCPU = "tCPU"
+# Breakdown of tFC in milliseconds, derived from the telemetry
+COLUMN_KERNEL = "t kernel"
+COLUMN_INIT = "t init"
+COLUMN_EXEC = "t exec"
+COLUMN_VMM = "t VMM"
+# Metrics reported by the workloads themselves, empty if a workload does not
+# report them: MB/s, operations/s and ns
+COLUMN_BANDWIDTH = "bandwidth"
+COLUMN_THROUGHPUT = "throughput"
+COLUMN_LATENCY = "latency"
+METRIC_COLUMNS = (COLUMN_BANDWIDTH, COLUMN_THROUGHPUT, COLUMN_LATENCY)
+DELTA_METRIC_COLUMNS = {c: "d " + c for c in METRIC_COLUMNS}
+# Joins the results to the Firecracker metrics of the instance
+COLUMN_INSTANCE = "instance"
 
 
 def recursive_file_search(directory: str, list_filter=None) -> list:
@@ -110,10 +141,11 @@ def calculate_baselines(baselines: pd.DataFrame) -> dict:
     Read a file that contains multiple runs of the same pair. The format of the
     file must be:
 
-    workload id, workload argument, run number, tFC, tVM
+    workload id, workload argument, run number, tFC, tVM[, metrics]
 
     This function calculates the average over all runs of each unique pair of
-    workload id and workload argument.
+    workload id and workload argument: [tFC, tVM, bandwidth, throughput,
+    latency]. A metric is NaN if the workload does not report it.
 
     """
     if type(baselines) is not pd.DataFrame:
@@ -138,8 +170,11 @@ def calculate_baselines(baselines: pd.DataFrame) -> dict:
             # Calculate the means of the timings for the workload-argument pair
             tVM = round(workload_argument_baseline[COLUMN_TIMEVM].mean())
             tFC = round(workload_argument_baseline[COLUMN_TIMEFC].mean())
+            # Mean of the runs that reported the metric
+            metrics = [workload_argument_baseline[c].mean() if c in baselines
+                       else np.nan for c in METRIC_COLUMNS]
 
-            processed_baselines[workload][argument] = [tFC, tVM]
+            processed_baselines[workload][argument] = [tFC, tVM] + metrics
 
     return processed_baselines
 
@@ -239,9 +274,7 @@ def calculate_average_baselines(directory: str = "", files: list = []) -> dict:
         all_baselines = files
 
     average_baselines = dict()
-    counter = 0
     for f in all_baselines:
-        counter += 1
         c = calculate_baselines(read_csv(f))
 
         for workload, arguments in c.items():
@@ -249,20 +282,24 @@ def calculate_average_baselines(directory: str = "", files: list = []) -> dict:
                 average_baselines[workload] = {}
 
             for argument, values in arguments.items():
-                if argument in average_baselines[workload]:
-                    average_baselines[workload][argument] = [
-                        v1 + v2 for v1, v2 in zip(average_baselines[workload][argument], values)]
-                else:
-                    average_baselines[workload][argument] = values
+                average_baselines[workload].setdefault(argument, []).append(
+                    values)
+
+    def average(runs):
+        # Over the files that have the pair, the metrics over the files that
+        # have them as well
+        runs = np.array(runs, dtype=float)
+        times = [round(v) for v in runs[:, :2].mean(axis=0)]
+        metrics = [m[~np.isnan(m)].mean() if (~np.isnan(m)).any()
+                   else np.nan for m in runs[:, 2:].T]
+        return times + metrics
 
-    # Calculate the average using dict comprehension
     # w = workload, key of first dict
     # a = argument, key of second dict
     return {
         w: {
-            a:  [
-                round(v / counter) for v in average_baselines[w][a]
-            ] for a in average_baselines[w].keys()
+            a: average(average_baselines[w][a])
+            for a in average_baselines[w].keys()
         } for w in average_baselines.keys()
     }
 
@@ -300,7 +337,8 @@ def max_concurrent_events(df: pd.DataFrame) -> int:
 
 
 def concurrency_histogram(df: pd.DataFrame, df_pred: pd.DataFrame,
-                          output: str = "", title: str = "", bin_size=1000):
+                          output: str = "", title: str = "", bin_size=1000,
+                          report: render.Report = None):
     """Given a processed dataframe, calculate the maximal number of concurrent
     jobs going on in certain bins (histogram).
 
@@ -314,6 +352,8 @@ def concurrency_histogram(df: pd.DataFrame, df_pred: pd.DataFrame,
     :type output: str
     :param bin_size: Bin size of the histogram in milliseconds
     :type bin_size: int
+    :param report: Report to add the histogram to, rather than to output
+    :type report: render.Report
     :returns: A tuple with two lists, bins of the results and the prediction
     :rtype: tuple[list, list]
     """
@@ -328,56 +368,46 @@ def concurrency_histogram(df: pd.DataFrame, df_pred: pd.DataFrame,
     has_predictions = isinstance(df_pred, pd.DataFrame)
     end_time = round(df[COLUMN_END].max())
 
-    second_bins = [-1 for i in range(0, end_time, bin_size)]
-    second_bins_pred = second_bins.copy()
-
-    # Ensure the time on x-axis is in seconds
-    seconds = [(i / 1000) for i in range(0, end_time, bin_size)]
-
-    df_bins = [(df, second_bins)]
+    bin_starts = np.arange(0, end_time, bin_size)
+    bin_ends = bin_starts + bin_size
+
+    def count_bins(frame):
+        # An instance is in a bin if it starts before the bin ends and ends
+        # after the bin starts. Count these for all bins at once on the
+        # sorted start and end times. Failed runs have no end and are never
+        # in a bin
+        times = frame[[COLUMN_START, COLUMN_END]].dropna()
+        starts = np.sort(times[COLUMN_START].to_numpy())
+        ends = np.sort(times[COLUMN_END].to_numpy())
+        return (np.searchsorted(starts, bin_ends, side="left")
+                - np.searchsorted(ends, bin_starts, side="right")).tolist()
+
+    second_bins = count_bins(df)
+    second_bins_pred = [-1 for i in range(0, end_time, bin_size)]
     if has_predictions:
-        df_bins.append((df_pred, second_bins_pred))
-
-    for second in range(0, end_time, bin_size):
-        bin_start = second
-        bin_end = second + bin_size
-
-        for df, bins in df_bins:
-            # Panda-ized approach (probably faster)
-            idx = round(second/bin_size)
-            bins[idx] = len(df[((df[COLUMN_END] > bin_start)
-                                & (df[COLUMN_END] <= bin_end))
-                               | ((df[COLUMN_START] >= bin_start)
-                                  & (df[COLUMN_START] < bin_end))
-                               | ((bin_start >= df[COLUMN_START])
-                                  & (bin_end <= df[COLUMN_END]))])
-
-        # second_bins[round(second/bin_size)] = len(df[((df[COLUMN_END] > bin_start) & (df[COLUMN_END] <= bin_end)) | (
-        #     (df[COLUMN_START] >= bin_start) & (df[COLUMN_START] < bin_end)) | ((bin_start >= df[COLUMN_START]) & (bin_end <= df[COLUMN_END]))])
-        # if has_predictions:
-        #     second_bins_pred[round(second/bin_size)] = len(df_pred[((df_pred[COLUMN_END] > bin_start) & (df_pred[COLUMN_END] <= bin_end)) | (
-        #         (df_pred[COLUMN_START] >= bin_start) & (df_pred[COLUMN_START] < bin_end)) | ((bin_start >= df_pred[COLUMN_START]) & (bin_end <= df_pred[COLUMN_END]))])
-
-        print("\r{}/{} seconds processed.".format(second, end_time),
-              file=sys.stderr, end="")
+        second_bins_pred = count_bins(df_pred)
 
-    err("")
-    if output:
-        plt.hist(seconds, len(seconds), weights=second_bins,
-                 alpha=0.5, label="Result", rasterized=True)
+    if output or report is not None:
+        # Ensure the time on x-axis is in seconds
+        edges = np.append(bin_starts, end_time if len(bin_starts) == 0
+                          else bin_ends[-1]) / 1000
+
+        fig = render.get_figure()
+        ax = fig.add_subplot(1, 1, 1)
+        render.step_histogram(ax, edges, second_bins, label="Result",
+                              alpha=0.5)
         if has_predictions:
-            plt.hist(seconds, len(seconds), weights=second_bins_pred,
-                     alpha=0.5, label="Prediction", rasterized=True)
-            plt.legend(loc="upper right", ncol=2)
-        plt.xlim(xmin=0)
-        plt.xlabel("Time (seconds)")
-        plt.ticklabel_format(axis="x", style="sci", scilimits=(0, 0))
-        plt.margins(x=0)
-        plt.ylabel("Amount of instances")
+            render.step_histogram(ax, edges, second_bins_pred,
+                                  label="Prediction", alpha=0.5)
+            ax.legend(loc="upper right", ncol=2)
+        ax.set_xlim(left=0)
+        ax.set_xlabel("Time (seconds)")
+        ax.ticklabel_format(axis="x", style="sci", scilimits=(0, 0))
+        ax.margins(x=0)
+        ax.set_ylabel("Amount of instances")
         if title:
-            plt.title(title)
-        plt.savefig(output)
-        plt.clf()
+            ax.set_title(title)
+        render.save(fig, output, report, heading=path.basename(output))
 
     return second_bins, second_bins_pred
 
@@ -391,33 +421,101 @@ def calculate_deltas(df: pd.DataFrame, baselines: dict) -> pd.DataFrame:
             or (COLUMN_TIMEVM not in df):
         raise ValueError("calculate_deltas: missing columns in data")
 
+    # Baseline of every row, in the order of the rows: tFC, tVM, metrics.
+    # Pairs without baseline have a baseline of 0 and no metrics
+    default = [0, 0] + [np.nan for _ in METRIC_COLUMNS]
+    baseline = np.array([
+        (list(b) + default[len(b):]) if b is not None else default
+        for b in (baselines.get(w, {}).get(a)
+                  for w, a in zip(df[COLUMN_WORKLOAD], df[COLUMN_ARGUMENT]))
+    ], dtype=float).reshape(-1, len(default))
+
     # Calculate deltas, end times
-    delta_fc = [0 for i in range(0, len(df))]
-    delta_vm = delta_fc.copy()
-    end_time = delta_fc.copy()
+    df[COLUMN_END] = df[COLUMN_START] + df[COLUMN_TIMEFC]
+    df[COLUMN_DELTA_FC] = df[COLUMN_TIMEFC] - baseline[:, 0].astype(np.int64)
+    df[COLUMN_DELTA_VM] = df[COLUMN_TIMEVM] - baseline[:, 1].astype(np.int64)
+
+    for i, column in enumerate(METRIC_COLUMNS):
+        if column in df:
+            df[DELTA_METRIC_COLUMNS[column]] = df[column] - baseline[:, 2 + i]
+
+    return df
 
-    for idx, row in df.iterrows():
-        baseline = baselines.get(row[COLUMN_WORKLOAD], {0: 0}).get(
-            row[COLUMN_ARGUMENT], [0, 0])
-        delta_fc[idx] = row[COLUMN_TIMEFC] - baseline[0]
-        delta_vm[idx] = row[COLUMN_TIMEVM] - baseline[1]
-        end_time[idx] = row[COLUMN_START] + row[COLUMN_TIMEFC]
 
-    df[COLUMN_END] = end_time
-    df[COLUMN_DELTA_FC] = delta_fc
-    df[COLUMN_DELTA_VM] = delta_vm
+def calculate_breakdown(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Break tFC of every instance down into milliseconds spent on booting the
+    guest kernel, running the init system up to the workload, executing the
+    workload and the remainder outside the guest (VMM start-up and teardown).
+
+    Requires the telemetry columns reported by the guest, returns the
+    dataframe unmodified if these are missing.
+    """
+    if type(df) is not pd.DataFrame:
+        raise TypeError("calculate_breakdown: argument is of incorrect type")
+
+    if not all(c in df for c in (COLUMN_TBOOT, COLUMN_TSTART, COLUMN_TEND)):
+        return df
+
+    df[COLUMN_KERNEL] = df[COLUMN_TBOOT] / 1e6
+    df[COLUMN_INIT] = (df[COLUMN_TSTART] - df[COLUMN_TBOOT]) / 1e6
+    df[COLUMN_EXEC] = (df[COLUMN_TEND] - df[COLUMN_TSTART]) / 1e6
+    df[COLUMN_VMM] = df[COLUMN_TIMEFC] - df[COLUMN_TEND] / 1e6
+
+    return df
+
+
+def label_workloads(df: pd.DataFrame, registry: dict) -> pd.DataFrame:
+    """Add the name and resource class of every workload, as declared in the
+    workload manifest"""
+    df[COLUMN_LABEL] = [workload_label(registry, w)
+                        for w in df[COLUMN_WORKLOAD]]
+    df[COLUMN_CLASS] = [workload_class(registry, w)
+                        for w in df[COLUMN_WORKLOAD]]
 
     return df
 
 
-def process_file(filename: str, baselines: dict, output=True) -> pd.DataFrame:
+def merge_vmm_metrics(df: pd.DataFrame, filename: str) -> tuple:
+    """
+    Add the Firecracker metrics of every instance, as collected by
+    vmm_metrics.py, to the results. Returns the dataframe and the added
+    columns, results without instance column are returned unmodified.
+    """
+    if COLUMN_INSTANCE not in df:
+        err("{} has no {} column, Firecracker metrics omitted".format(
+            filename, COLUMN_INSTANCE))
+        return df, []
+
+    vmm_df = read_csv(filename)
+    # Released and hung up instances are written once, but be safe
+    vmm_df = vmm_df.drop_duplicates(subset=COLUMN_INSTANCE, keep="last")
+    columns = [c for c in vmm_df.columns if c not in df]
+
+    merged = df.merge(vmm_df[[COLUMN_INSTANCE] + columns], how="left",
+                      on=COLUMN_INSTANCE)
+    # merge() drops the index, which is still used for the order
+    merged.index = df.index
+
+    return merged, columns
+
+
+def process_file(filename: str, baselines: dict, output=True,
+                 registry: dict = None, vmm_file: str = None) -> pd.DataFrame:
     """
         Processes a single file and write the results to another file.
         This file will have the systematic name "processed_{filename}"
+
+        If vmm_file is given, the Firecracker metrics of every instance are
+        added to the results. Without registry, the default workload manifest
+        is used to label the workloads.
     """
     if not path.isfile(filename):
         raise FileNotFoundError("File {} does not exist!".format(filename))
 
+    if registry is None:
+        registry = read_manifest(DEFAULT_MANIFEST)
+
     write_to_name = "processed-{}".format(path.basename(filename))
     write_to_name = path.join(path.split(filename)[0], write_to_name)
 
@@ -430,7 +528,13 @@ def process_file(filename: str, baselines: dict, output=True) -> pd.DataFrame:
     result_df[COLUMN_START] = (result_df[COLUMN_START] - start_time) * 1000
 
     result_df = calculate_deltas(result_df, baselines)
-    
+    result_df = calculate_breakdown(result_df)
+    result_df = label_workloads(result_df, registry)
+
+    vmm_columns = []
+    if vmm_file:
+        result_df, vmm_columns = merge_vmm_metrics(result_df, vmm_file)
+
     # Perform some datacleansing here
     # result_df = result_df[]
 
@@ -452,6 +556,26 @@ def process_file(filename: str, baselines: dict, output=True) -> pd.DataFrame:
         to_write.append(
             ("Mean of delta tVM", result_df[COLUMN_DELTA_VM].mean()))
 
+        for label, group in result_df.groupby(COLUMN_LABEL):
+            to_write.append(("Mean of delta tFC ({})".format(label),
+                             group[COLUMN_DELTA_FC].mean()))
+
+            # Only the metrics this workload reports
+            for column in DELTA_METRIC_COLUMNS.values():
+                if column in group and group[column].notna().any():
+                    to_write.append(("Mean of {} ({})".format(column, label),
+                                     group[column].mean()))
+
+        for column in (COLUMN_KERNEL, COLUMN_INIT, COLUMN_EXEC, COLUMN_VMM):
+            if column in result_df:
+                to_write.append(("Mean of {}".format(column),
+                                 result_df[column].mean()))
+
+        for column in vmm_columns:
+            if result_df[column].notna().any():
+                to_write.append(("Mean of {}".format(column),
+                                 result_df[column].mean()))
+
         with open(write_to_name, "w") as f:
             for t in to_write:
                 f.write("# {}: {} \n".format(t[0], t[1]))
@@ -463,25 +587,17 @@ def process_file(filename: str, baselines: dict, output=True) -> pd.DataFrame:
     return result_df
 
 
-def sysmon_graphs(df: pd.DataFrame, title: str = "sysmon output", output: str = "sysmon.png", total_mem: int = -1) -> None:
+def sysmon_graphs(df: pd.DataFrame, title: str = "sysmon output", output: str = "sysmon.png",
+                  total_mem: int = -1, report: render.Report = None) -> None:
     """
     Create graphs with the metrics output by the system monitor.
 
-    For now: simple line graphs
+    For now: simple line graphs, every series is reduced to its min/max
+    envelope, so long runs do not plot every sample
     """
     # Process the following columns
     process_cols = ["t", "cpu_user", "cpu_system", "cpu_idle", "cpu_inter"]
 
-    # for pcol in process_cols:
-    #     if pcol not in df:
-    #         continue
-
-    #     df[pcol] = df[pcol] - df[pcol][0]
-
-    nrows = len(df.columns) - len(process_cols) + 1
-    ncols = 1
-    idx = 1
-
     if "swap_used" in df:
         if df["swap_used"].max() == 0 and df["swap_used"].max() == df["swap_used"].min():
             df = df.drop("swap_used", axis=1)
@@ -492,48 +608,53 @@ def sysmon_graphs(df: pd.DataFrame, title: str = "sysmon output", output: str =
     if total_mem > 0 and "mem_avail" in df:
         df.mem_avail = (df.mem_avail / total_mem) * 100
 
-    # Keep track whether we saw one of the process_plots already
-    # as we're gonna plot these all in the same plot
-    process_col_one = True
-
     # Do not need the 't' column to be in df
-    x_axis = df.t - df.t.min()
+    x_axis = (df.t - df.t.min()).to_numpy()
     df = df.drop(df.t.name, axis=1)
+
+    # All process columns share the first row
+    nrows = len([col for col in df.columns if col not in process_cols])
+    if any(col in process_cols for col in df.columns):
+        nrows += 1
+
+    fig = render.get_figure()
     list_ax = []
-    subplot_args = {}
+    ax_process = None
 
     for col in df.columns:
-        if idx > 1:
-            subplot_args["sharex"] = list_ax[0]
-
-        if col not in process_cols or process_col_one:
-            ax = plt.subplot(nrows, ncols, idx, **subplot_args)
-            list_ax.append(ax)
-            process_col_one = False
-            idx += 1
+        if col in process_cols and ax_process is not None:
+            ax = ax_process
+            ax.set_ylabel("Percentage %")
         else:
-            plt.ylabel("Percentage %")
+            ax = fig.add_subplot(nrows, 1, len(list_ax) + 1,
+                                 sharex=list_ax[0] if list_ax else None)
+            list_ax.append(ax)
+
+            if col in process_cols:
+                ax_process = ax
 
-        list_ax[-1].plot(x_axis, df[col], ",--", label=col)
-        list_ax[-1].legend(loc="upper right")
-        plt.xlabel("time (s)")
+        x, y = render.minmax_envelope(x_axis, df[col])
+        ax.plot(x, y, "-", linewidth=0.5, label=col)
+        ax.legend(loc="upper right")
+        ax.set_xlabel("time (s)")
 
         if col == "mem_avail":
-            plt.ylabel("Percentage available")
+            ax.set_ylabel("Percentage available")
 
-    plt.suptitle(title)
-    # plt.tight_layout()
-    # plt.show()
-    plt.savefig(output)
-    plt.clf()
+    fig.suptitle(title)
+    render.save(fig, output, report, heading=path.basename(output))
 
 
-def process_data(directory: str, no_titles: bool = False) -> None:
+def process_data(directory: str, no_titles: bool = False,
+                 manifest: str = DEFAULT_MANIFEST, report: str = "") -> None:
     """
     Gather all files in a directory and its subdirectories and process these
     result files. It is advisable to call this function per directory that
     contains data from multiple machines/experiments. For example, a directory
     that contains all experiments for the CFS scheduler.
+
+    If report is "pdf" or "html", all graphs are collected in a single report
+    in the directory, rather than written as separate images.
     """
     if not path.isdir(directory):
         raise FileNotFoundError(
@@ -569,6 +690,8 @@ def process_data(directory: str, no_titles: bool = False) -> None:
         if d in files_per_dir:
             del files_per_dir[d]
 
+    registry = read_manifest(manifest)
+
     # Calculate this once, as we're gonna use this for the predictions
     err("Calculating average baselines...")
     avg_baselines = calculate_average_baselines(
@@ -611,6 +734,11 @@ def process_data(directory: str, no_titles: bool = False) -> None:
                 # Unsupported file
                 err(f"Skipping file {workload_name}")
 
+    graph_report = None
+    if report:
+        graph_report = render.Report(path.join(directory, REPORT_PREFIX + report),
+                                     kind=report, title=path.basename(directory))
+
     # Process all the files
     err("Starting processing of results...")
     for d, files in files_per_dir.items():
@@ -622,7 +750,10 @@ def process_data(directory: str, no_titles: bool = False) -> None:
                 workload_name = f[len(RESULTS_PREFIX):]
                 preds = predictions.get(workload_name, None)
                 # Process the results and write them to a file + store in variable
-                proc_df = process_file(path.join(d, f), baselines_per_dir[d])
+                vmm_file = VMM_PREFIX + workload_name
+                vmm_file = path.join(d, vmm_file) if vmm_file in files else None
+                proc_df = process_file(path.join(d, f), baselines_per_dir[d],
+                                       registry=registry, vmm_file=vmm_file)
 
                 prefix_start = d.find("results")
                 if prefix_start < 0:
@@ -640,7 +771,8 @@ def process_data(directory: str, no_titles: bool = False) -> None:
                 _, _ = concurrency_histogram(df=proc_df, df_pred=preds,
                                              output=path.join(d, histo_name),
                                              title=histo_title,
-                                             bin_size=bin_size)
+                                             bin_size=bin_size,
+                                             report=graph_report)
 
             elif f.startswith(SYSMON_RESULTS_PREFIX) and f.endswith(SYSMON_EXT):
                 # Create some graphs of the sysmon results and store these
@@ -672,7 +804,13 @@ def process_data(directory: str, no_titles: bool = False) -> None:
                     graph_title = ""
 
                 sysmon_graphs(sysmon_df, title=graph_title,
-                              output=graph_output, total_mem=total_mem)
+                              output=graph_output, total_mem=total_mem,
+                              report=graph_report)
+
+    if graph_report is not None:
+        err("Writing {} graphs to {}".format(graph_report.pages,
+                                             graph_report.output))
+        graph_report.close()
 
 
 if __name__ == "__main__":
@@ -684,6 +822,12 @@ if __name__ == "__main__":
     arg_parser.add_argument("--without-titles", "-w", default=False,
                             action="store_true",
                             help="Create the graphs without titles")
+    arg_parser.add_argument("--manifest", "-m", default=DEFAULT_MANIFEST,
+                            help="Workload manifest used to label the workloads")
+    arg_parser.add_argument("--report", "-r", default="",
+                            choices=render.REPORT_FORMATS,
+                            help=("Collect all graphs in a single report per "
+                                  "directory, rather than separate images"))
 
     if len(sys.argv) < 2:
         arg_parser.print_help()
@@ -692,4 +836,5 @@ if __name__ == "__main__":
     args = arg_parser.parse_args()
 
     if args.directory:
-        process_data(args.directory, args.without_titles)
+        process_data(args.directory, args.without_titles, args.manifest,
+                     args.report)
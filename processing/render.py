@@ -0,0 +1,135 @@
+"""
+    Firecracker Microbenchmark
+    (c) Niels Boonstra, 2020
+    File: render.py
+
+    Fast rendering of the graphs of process_results.py:
+        - Downsample long series to a min/max envelope before plotting
+        - Draw histograms from precomputed bins as a single step artist
+        - Reuse figures, rather than building new pyplot state per file
+        - Optionally collect all graphs in a single PDF or HTML report
+"""
+
+import base64
+import io
+import html
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.backends.backend_pdf import PdfPages
+
+# A series is reduced to at most this number of points, which is more than the
+# horizontal resolution of the saved figures
+MAX_POINTS = 2000
+DEFAULT_FIGSIZE = (6.4, 4.8)
+REPORT_FORMATS = ("pdf", "html")
+
+# Figures by size, reused for every graph of that size
+_figures = {}
+
+
+def get_figure(figsize: tuple = DEFAULT_FIGSIZE) -> Figure:
+    """Return a cleared figure of the given size. The figure is not managed by
+    pyplot, so it is not kept alive by it and rendering has no global state."""
+    fig = _figures.get(figsize)
+
+    if fig is None:
+        fig = Figure(figsize=figsize)
+        FigureCanvasAgg(fig)
+        _figures[figsize] = fig
+    else:
+        fig.clf()
+
+    return fig
+
+
+def minmax_envelope(x, y, max_points: int = MAX_POINTS) -> tuple:
+    """
+    Downsample a series to at most max_points points, by splitting it in
+    max_points / 2 buckets and keeping the minimum and the maximum of every
+    bucket, in their original order. Unlike plain subsampling, this keeps
+    every peak visible.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+
+    if n <= max_points:
+        return x, y
+
+    num_buckets = max_points // 2
+    bucket_size = -(-n // num_buckets)
+    num_buckets = -(-n // bucket_size)
+
+    # Pad the last bucket, NaNs are ignored by nanargmin/nanargmax
+    padded = np.full(num_buckets * bucket_size, np.nan)
+    padded[:n] = y
+    # Buckets that only hold NaNs (gaps in the data) select their first item
+    padded = padded.reshape(num_buckets, bucket_size)
+    all_nan = np.isnan(padded).all(axis=1)
+    padded[all_nan, 0] = 0
+
+    offsets = np.arange(num_buckets) * bucket_size
+    idx_min = offsets + np.nanargmin(padded, axis=1)
+    idx_max = offsets + np.nanargmax(padded, axis=1)
+
+    idx = np.stack((np.minimum(idx_min, idx_max),
+                    np.maximum(idx_min, idx_max)), axis=1).ravel()
+    idx = np.minimum(idx, n - 1)
+
+    return x[idx], y[idx]
+
+
+def step_histogram(ax, edges, counts, label: str = "", **kwargs) -> None:
+    """Draw precomputed bins as one filled step artist, rather than a bar
+    per bin"""
+    ax.stairs(counts, edges, fill=True, label=label, **kwargs)
+
+
+class Report:
+    """Collects figures in a single multi-page PDF or an HTML page"""
+
+    def __init__(self, output: str, kind: str = "pdf", title: str = ""):
+        if kind not in REPORT_FORMATS:
+            raise ValueError("Report: unknown format {}".format(kind))
+
+        self.output = output
+        self.kind = kind
+        self.title = title
+        self.pages = 0
+        self._pdf = PdfPages(output) if kind == "pdf" else None
+        self._html = []
+
+    def add(self, fig: Figure, heading: str = "") -> None:
+        self.pages += 1
+
+        if self._pdf is not None:
+            self._pdf.savefig(fig)
+            return
+
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png")
+        self._html.append("<h2>{}</h2>\n<img src=\"data:image/png;base64,{}\"/>"
+                          .format(html.escape(heading),
+                                  base64.b64encode(buf.getvalue()).decode()))
+
+    def close(self) -> None:
+        if self._pdf is not None:
+            self._pdf.close()
+            return
+
+        with open(self.output, "w") as f:
+            f.write("<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">"
+                    "<title>{0}</title></head>\n<body>\n<h1>{0}</h1>\n"
+                    .format(html.escape(self.title)))
+            f.write("\n".join(self._html))
+            f.write("\n</body></html>\n")
+
+
+def save(fig: Figure, output: str = "", report: Report = None,
+         heading: str = "") -> None:
+    """Write a figure to its own file, or add it to the report"""
+    if report is not None:
+        report.add(fig, heading)
+    elif output:
+        fig.savefig(output)
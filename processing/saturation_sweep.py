@@ -0,0 +1,355 @@
+"""
+    Firecracker Microbenchmark
+    (c) Niels Boonstra, 2020
+    File: saturation_sweep.py
+
+    Search the saturation point of a host: the highest arrival rate
+    (instances/hr) at which the microVMs are not slowed down too much.
+
+    Every step generates a short Poisson workload at one arrival rate with the
+    workload generator, runs it with benchmark.sh and follows its events
+    (see live_metrics.py) while it runs. A step is sustainable if the p99
+    slowdown of tFC, compared to the baselines, stays below a threshold and
+    arrivals are not late. The rate is doubled until a step is not
+    sustainable, after which the knee is binary searched between the last
+    sustainable and the first unsustainable rate.
+
+    The search is repeated for every combination of scheduler (the policy
+    benchmark.sh runs under, inherited by the microVMs) and workload mix.
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import threading
+import time
+from os import path
+
+import numpy as np
+
+import process_results as pr
+import workload_generator as wg
+from registry import DEFAULT_MANIFEST, read_manifest
+
+__PROGRAM_DESCRIPTION__ = """Search the maximal sustainable arrival rate"""
+
+MY_LOCATION = path.dirname(path.abspath(__file__))
+
+BENCHMARK = path.abspath(path.join(MY_LOCATION, "../scripts/benchmark.sh"))
+RESULTS_DIR = path.abspath(path.join(MY_LOCATION, "../results"))
+# Scheduling policies of chrt, cfs is the default policy
+SCHEDULERS = {"cfs": "--other", "batch": "--batch", "idle": "--idle"}
+SWEEP_PREFIX = "sweep-"
+
+SWEEP_HEADER = ("scheduler, mix, rate, instances, completed, failed, "
+                "p50 slowdown, p99 slowdown, p99 d tFC, p99 lateness, "
+                "sustainable\n")
+
+
+class StepMonitor:
+    """Follows the events of one step, see live_metrics.BenchmarkMetrics.
+    Keeps every measurement, as a step is short."""
+
+    def __init__(self, instances: list, baselines: dict):
+        # (workload ID, argument) of every instance ID
+        self.instances = instances
+        self.baselines = baselines
+        self.lock = threading.Lock()
+        self.first_arrival = None
+        self.planned_offset = 0.0
+        self.lateness = []
+        self.slowdown = []
+        self.delta_fc = []
+        self.failed = 0
+
+    def event(self, line: str) -> None:
+        split = line.split()
+        if not split:
+            return
+
+        with self.lock:
+            if split[0] == "scheduled" and len(split) >= 4:
+                epoch = float(split[2])
+                if self.first_arrival is None:
+                    self.first_arrival = epoch
+                self.lateness.append(max(
+                    0.0, epoch - self.first_arrival - self.planned_offset))
+                self.planned_offset += float(split[3])
+            elif split[0] == "completed" and len(split) >= 4:
+                wid, arg = self.instances[int(split[1])]
+                baseline = self.baselines.get(wid, {}).get(arg, [0, 0])[0]
+                tfc = float(split[2])
+                if baseline > 0:
+                    self.slowdown.append(tfc / baseline)
+                    self.delta_fc.append(tfc - baseline)
+            elif split[0] == "failed":
+                self.failed += 1
+
+    def summary(self) -> dict:
+        with self.lock:
+            def p(values, q):
+                return float(np.percentile(values, q)) if values else float("nan")
+
+            return {
+                "completed": len(self.slowdown),
+                "failed": self.failed,
+                "p50 slowdown": p(self.slowdown, 50),
+                "p99 slowdown": p(self.slowdown, 99),
+                "p99 d tFC": p(self.delta_fc, 99),
+                "p99 lateness": p(self.lateness, 99),
+            }
+
+
+def read_events(fd: int, monitor_ref: list) -> None:
+    """Pass the events of the FIFO to the monitor of the current step"""
+    with os.fdopen(fd, "r") as events:
+        for line in events:
+            monitor = monitor_ref[0]
+            if monitor is None:
+                continue
+            try:
+                monitor.event(line)
+            except (ValueError, IndexError):
+                pr.err("Malformed event: {}".format(line.strip()))
+
+
+def step_workload(wid_args: dict, mix: list, rate: float, window: float,
+                  min_instances: int) -> list:
+    """Poisson workload of at least window seconds at rate instances/hr"""
+    n = max(min_instances, int(round(rate * window / 3600)))
+    return wg.generate_poisson_workload(wid_args, mix, n, n / rate)
+
+
+def run_step(args, scheduler: str, mix_name: str, wid_args: dict, mix: list,
+             rate: float, baselines: dict, monitor_ref: list, fifo: str,
+             sweep_dir: str) -> dict:
+    workload = step_workload(wid_args, mix, rate, args.window,
+                             args.min_instances)
+    instances = [tuple(int(s) for s in line.split(",")[:2])
+                 for line in workload]
+
+    name = "{}{}-{}-{}-{}.txt".format(SWEEP_PREFIX, path.basename(sweep_dir),
+                                      scheduler, mix_name.replace("/", "_"),
+                                      int(rate))
+    workload_file = path.join(sweep_dir, name)
+    with open(workload_file, "w") as f:
+        f.writelines(workload)
+
+    monitor = StepMonitor(instances, baselines)
+    monitor_ref[0] = monitor
+
+    # Live instances of the stub launcher, counted for this step only
+    stub_state = path.join(sweep_dir, path.splitext(name)[0] + ".count")
+    open(stub_state, "w").close()
+
+    env = dict(os.environ, FC_METRICS_FIFO=fifo, FC_STUB_STATE=stub_state)
+    command = ["chrt", SCHEDULERS[scheduler], "0",
+               BENCHMARK, args.kernel, args.rootfs, args.workloads,
+               str(args.num), workload_file, "1"]
+
+    pr.err("Step: {} {} at {:.0f} instances/hr, {} instances".format(
+        scheduler, mix_name, rate, len(instances)))
+
+    with open(os.devnull, "w") as devnull:
+        subprocess.run(command, env=env, stdout=devnull,
+                       stderr=None if args.verbose else devnull)
+
+    # benchmark.sh waits for its instances, wait for their last events
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        summary = monitor.summary()
+        if summary["completed"] + summary["failed"] >= len(instances):
+            break
+        time.sleep(0.1)
+
+    monitor_ref[0] = None
+    os.remove(stub_state)
+
+    # Keep the results of the steps together with their workloads
+    results_file = path.join(RESULTS_DIR, pr.RESULTS_PREFIX + name)
+    if path.isfile(results_file):
+        shutil.move(results_file, path.join(sweep_dir, pr.RESULTS_PREFIX + name))
+
+    summary = monitor.summary()
+    summary["rate"] = rate
+    summary["instances"] = len(instances)
+    summary["sustainable"] = sustainable(summary, args)
+
+    pr.err("  p50/p99 slowdown {:.2f}/{:.2f}, p99 lateness {:.3f} s, "
+           "failed {}: {}".format(summary["p50 slowdown"],
+                                  summary["p99 slowdown"],
+                                  summary["p99 lateness"], summary["failed"],
+                                  "sustainable" if summary["sustainable"]
+                                  else "not sustainable"))
+
+    return summary
+
+
+def sustainable(summary: dict, args) -> bool:
+    if summary["completed"] == 0:
+        return False
+
+    if summary["failed"] > args.max_failed * summary["instances"]:
+        return False
+
+    return (summary["p99 slowdown"] <= args.threshold
+            and summary["p99 lateness"] <= args.max_lateness)
+
+
+def search(run, args) -> tuple:
+    """
+    Ramp the rate from args.start, multiplying it by args.factor, until a step
+    is not sustainable. Then binary search between the last sustainable and
+    the first unsustainable rate, until they are within args.precision of
+    each other. Returns the maximal sustainable rate (0 if even the first step
+    is not sustainable) and all steps.
+    """
+    steps = []
+    good, bad = 0.0, None
+    rate = args.start
+
+    while rate <= args.max_rate:
+        step = run(rate)
+        steps.append(step)
+
+        if not step["sustainable"]:
+            bad = rate
+            break
+
+        good = rate
+        rate *= args.factor
+
+    if bad is None:
+        pr.err("Sustainable up to the maximal rate {}".format(args.max_rate))
+        return good, steps
+
+    lo = good if good > 0 else bad / args.factor
+    hi = bad
+
+    while (hi - lo) / hi > args.precision and len(steps) < args.max_steps:
+        rate = (lo + hi) / 2
+        step = run(rate)
+        steps.append(step)
+
+        if step["sustainable"]:
+            lo = good = rate
+        else:
+            hi = rate
+
+    return good, steps
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__PROGRAM_DESCRIPTION__)
+
+    arg_parser.add_argument("-b", "--baselines", required=True, type=str,
+                            help="Baseline file, determines the workload-argument pairs and their tFC without load")
+    arg_parser.add_argument("-x", "--mix", action="append", type=str,
+                            help="Mix of the workloads, as for the workload generator, e.g. 1/1/1 or cpu=2/mem=1. Can be repeated, default: equal")
+    arg_parser.add_argument("-s", "--scheduler", action="append", type=str, choices=SCHEDULERS.keys(),
+                            help="Scheduling policy of the benchmark and its microVMs. Can be repeated, default: cfs")
+    arg_parser.add_argument("-k", "--kernel", type=str, default=path.join(MY_LOCATION, "../resources/vmlinux"))
+    arg_parser.add_argument("-f", "--rootfs", type=str, default=path.join(MY_LOCATION, "../resources/rootfs.ext4"))
+    arg_parser.add_argument("-w", "--workloads", type=str, default=DEFAULT_MANIFEST,
+                            help="Workload manifest")
+    arg_parser.add_argument("-n", "--num", type=int, default=1000,
+                            help="Maximal number of live instances, passed to benchmark.sh")
+    arg_parser.add_argument("-t", "--threshold", type=float, default=1.5,
+                            help="Maximal p99 slowdown of tFC compared to the baseline")
+    arg_parser.add_argument("-l", "--max-lateness", type=float, default=1.0,
+                            help="Maximal p99 lateness of arrivals in seconds")
+    arg_parser.add_argument("--max-failed", type=float, default=0.01,
+                            help="Maximal fraction of failed instances")
+    arg_parser.add_argument("-W", "--window", type=float, default=120.0,
+                            help="Minimal duration of the arrivals of a step in seconds")
+    arg_parser.add_argument("--min-instances", type=int, default=20,
+                            help="Minimal number of instances of a step")
+    arg_parser.add_argument("-r", "--start", type=float, default=1000.0,
+                            help="Arrival rate of the first step in instances/hr")
+    arg_parser.add_argument("--factor", type=float, default=2.0,
+                            help="Factor the rate is ramped up with")
+    arg_parser.add_argument("--max-rate", type=float, default=1000000.0,
+                            help="Stop ramping at this rate")
+    arg_parser.add_argument("-p", "--precision", type=float, default=0.05,
+                            help="Stop searching once the knee is known within this fraction")
+    arg_parser.add_argument("--max-steps", type=int, default=20,
+                            help="Maximal number of steps of a search")
+    arg_parser.add_argument("-o", "--output", type=str, default="",
+                            help="Directory for the step workloads and the summary, default: results/sweep-<time>")
+    arg_parser.add_argument("-v", "--verbose", default=False, action="store_true",
+                            help="Show the output of benchmark.sh")
+
+    args = arg_parser.parse_args()
+
+    mixes = args.mix or ["equal"]
+    schedulers = args.scheduler or ["cfs"]
+
+    baselines = pr.calculate_baselines(pr.read_csv(args.baselines))
+    all_wid_args = {w: list(a.keys()) for w, a in baselines.items()}
+    registry = read_manifest(args.workloads)
+
+    sweep_dir = args.output or path.join(
+        RESULTS_DIR, SWEEP_PREFIX + time.strftime("%Y%m%d-%H%M%S"))
+    os.makedirs(sweep_dir, exist_ok=True)
+
+    # Opened for writing as well, so it does not reach EOF between steps
+    fifo = path.join(sweep_dir, "events.fifo")
+    if not path.exists(fifo):
+        os.mkfifo(fifo)
+    monitor_ref = [None]
+    threading.Thread(target=read_events,
+                     args=(os.open(fifo, os.O_RDWR), monitor_ref),
+                     daemon=True).start()
+
+    summary_file = path.join(sweep_dir, "sweep.txt")
+    with open(summary_file, "w") as f:
+        f.write(SWEEP_HEADER)
+
+    knees = []
+
+    for scheduler in schedulers:
+        for mix_name in mixes:
+            if mix_name == "equal":
+                wid_args = all_wid_args
+                mix = [1 / len(wid_args) for _ in wid_args]
+            elif "=" in mix_name:
+                wid_args, mix = wg.parse_named_mix(mix_name, registry,
+                                                   all_wid_args)
+            else:
+                wid_args, mix = all_wid_args, wg.parse_mix(mix_name, len(all_wid_args))
+
+            if len(wid_args) != len(mix):
+                arg_parser.error("The mix {} contains {} values, but there are {} workload IDs!".format(
+                    mix_name, len(mix), len(wid_args)))
+
+            def run(rate):
+                step = run_step(args, scheduler, mix_name, wid_args, mix,
+                                rate, baselines, monitor_ref, fifo, sweep_dir)
+
+                with open(summary_file, "a") as f:
+                    f.write("{}, {}, {:.0f}, {}, {}, {}, {:.3f}, {:.3f}, "
+                            "{:.0f}, {:.3f}, {}\n".format(
+                                scheduler, mix_name, rate, step["instances"],
+                                step["completed"], step["failed"],
+                                step["p50 slowdown"], step["p99 slowdown"],
+                                step["p99 d tFC"], step["p99 lateness"],
+                                int(step["sustainable"])))
+
+                return step
+
+            knee, steps = search(run, args)
+            knees.append((scheduler, mix_name, knee, len(steps)))
+
+    with open(summary_file, "a") as f:
+        for scheduler, mix_name, knee, num_steps in knees:
+            f.write("# Max. sustainable instances/hr ({}, {}): {:.0f} \n"
+                    .format(scheduler, mix_name, knee))
+
+    print("scheduler, mix, max. sustainable instances/hr, steps")
+    for scheduler, mix_name, knee, num_steps in knees:
+        print("{}, {}, {:.0f}, {}".format(scheduler, mix_name, knee,
+                                          num_steps))
+
+    os.unlink(fifo)
+    pr.err("Steps written to {}".format(summary_file))
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+    Firecracker Microbenchmark
+    (c) Niels Boonstra, 2020
+    File: stub_launcher.py
+
+    Stand-in for launch-firecracker.sh that does not need KVM, for testing the
+    benchmark and the saturation sweep. Set FC_LAUNCHER to this file.
+
+    Every instance needs the baseline tFC of its workload-argument pair of
+    CPU time. The host has FC_STUB_CAPACITY cores: as long as fewer instances
+    are live, every instance runs at full speed, beyond that the cores are
+    shared equally (processor sharing). Live instances are counted in the file
+    FC_STUB_STATE, so every tick costs the same, however many instances live.
+    The count is only right for a single run: saturation_sweep.py passes a
+    new file for every step, other runs should remove the file first.
+
+    Arguments are those of launch-firecracker.sh in timed mode:
+        <kernel> <rootfs> <fcID> <workload> <argument> t
+    The workload ID is looked up in FC_STUB_MANIFEST to find the baseline.
+"""
+
+import csv
+import fcntl
+import os
+import signal
+import sys
+import time
+from os import path
+
+__PROGRAM_DESCRIPTION__ = """Simulated microVM launcher with a capacity limit"""
+
+MY_LOCATION = path.dirname(path.abspath(__file__))
+
+DEFAULT_MANIFEST = path.abspath(path.join(MY_LOCATION, "../parameters/workloads.manifest"))
+# Pairs without baseline take this long (ms)
+DEFAULT_TFC = 1000
+# Time of tFC spent outside the workload (ms)
+BOOT_TIME = 250
+TICK = 0.01
+# The counter is a fixed width integer, so it is rewritten in place
+COUNTER_WIDTH = 16
+
+
+def read_baselines(filename: str) -> dict:
+    """Mean tFC and tVM per (workload ID, argument) of a baseline file"""
+    sums = {}
+
+    with open(filename, "r") as f:
+        rows = csv.DictReader((line for line in f if not line.startswith("#")),
+                              skipinitialspace=True)
+        for row in rows:
+            key = (int(row["workloadID"]), int(row["workload argument"]))
+            s = sums.setdefault(key, [0, 0, 0])
+            s[0] += float(row["tFC"])
+            s[1] += float(row["tVM"])
+            s[2] += 1
+
+    return {k: (s[0] / s[2], s[1] / s[2]) for k, s in sums.items()}
+
+
+def workload_id(manifest: str, name: str) -> int:
+    with open(manifest, "r") as f:
+        for line in f:
+            split = [s.strip() for s in line.split(",")]
+            if len(split) > 1 and not line.startswith("#") and split[1] == name:
+                return int(split[0])
+
+    return -1
+
+
+def read_counter(fd: int) -> int:
+    value = os.pread(fd, COUNTER_WIDTH, 0).strip()
+    return int(value) if value else 0
+
+
+def live_instances(fd: int) -> int:
+    fcntl.flock(fd, fcntl.LOCK_SH)
+    try:
+        return read_counter(fd)
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+def add_instances(fd: int, delta: int) -> None:
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    try:
+        value = max(0, read_counter(fd) + delta)
+        os.pwrite(fd, "{:{}d}".format(value, COUNTER_WIDTH).encode(), 0)
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+def run(work: float, capacity: int, state: str) -> float:
+    """Run until work seconds of CPU time are received, returns the
+    elapsed time in seconds"""
+    fd = os.open(state, os.O_RDWR | os.O_CREAT, 0o644)
+    add_instances(fd, 1)
+
+    start = time.monotonic()
+    last = start
+    done = 0.0
+
+    try:
+        while done < work:
+            time.sleep(TICK)
+            now = time.monotonic()
+            live = max(1, live_instances(fd))
+            done += (now - last) * min(1.0, capacity / live)
+            last = now
+    finally:
+        add_instances(fd, -1)
+        os.close(fd)
+
+    return time.monotonic() - start
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 6:
+        print("Usage: {} <kernel> <rootfs> <fcID> <workload> <argument> [t]"
+              .format(sys.argv[0]), file=sys.stderr)
+        exit(1)
+
+    workload, argument = sys.argv[4], int(sys.argv[5])
+
+    # A stopped run must still leave the count
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+
+    capacity = int(os.environ.get("FC_STUB_CAPACITY", "8"))
+    state = os.environ.get("FC_STUB_STATE",
+                           "/tmp/fc-stub-{}.count".format(os.getuid()))
+    manifest = os.environ.get("FC_STUB_MANIFEST", DEFAULT_MANIFEST)
+
+    tfc, tvm = DEFAULT_TFC, DEFAULT_TFC - BOOT_TIME
+    if os.environ.get("FC_STUB_BASELINES"):
+        baselines = read_baselines(os.environ["FC_STUB_BASELINES"])
+        tfc, tvm = baselines.get((workload_id(manifest, workload), argument),
+                                 (tfc, tvm))
+
+    elapsed = run(tfc / 1000, capacity, state) * 1000
+    # The workload gets the same share of the slowdown as in the baseline
+    vm = elapsed * tvm / tfc
+    boot_ns = int(BOOT_TIME / 2 * 1e6)
+    start_ns = int((elapsed - vm) / 2 * 1e6)
+
+    print("Launching Firecracker...")
+    print("fc: {}".format(round(elapsed)))
+    print("mVM: {}".format(round(vm)))
+    print("telemetry: boot={} init={} start={} end={} cpu={} status=0".format(
+        boot_ns, start_ns, start_ns, start_ns + int(vm * 1e6),
+        int(tvm * 1e6)))
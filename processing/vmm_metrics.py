@@ -0,0 +1,327 @@
+"""
+    Firecracker Microbenchmark
+    (c) Niels Boonstra, 2020
+    File: vmm_metrics.py
+
+    Collect the metrics and logs Firecracker itself writes for every microVM,
+    with a single process for all microVMs on the host.
+
+    Every timed microVM writes its metrics (JSON, one object per flush) and its
+    log to its own FIFO, see scripts/vmmmetrics.sh. The FIFOs are announced on
+    the control FIFO of the directory:
+        add <id> <metrics FIFO> <log FIFO>      before the microVM starts
+        release <id>                            after Firecracker exited
+    All FIFOs are multiplexed with epoll and read without blocking, the JSON
+    objects are decoded as soon as they are complete. Once both FIFOs of a
+    microVM are closed, or it is released, a single summary row is written,
+    which joins the results of the benchmark on the instance column, and the
+    FIFOs are removed. Only the collector removes them, so a collector that
+    falls behind still finds them.
+"""
+
+import argparse
+import fnmatch
+import json
+import os
+import re
+import select
+import sys
+from os import path
+
+__PROGRAM_DESCRIPTION__ = """Collect the Firecracker metrics and logs of all microVMs"""
+
+CONTROL_FIFO = "control.fifo"
+COLUMN_INSTANCE = "instance"
+COLUMN_FLUSHES = "flushes"
+# Summary columns with the flattened metrics ("group.metric") that are summed
+# into them
+VMM_COLUMNS = {
+    "exits io": ("vcpu.exit_io_*",),
+    "exits mmio": ("vcpu.exit_mmio_*",),
+    "block reads": ("block.read_count",),
+    "block writes": ("block.write_count",),
+    "block read bytes": ("block.read_bytes",),
+    "block write bytes": ("block.write_bytes",),
+    "serial bytes": ("uart.write_count",),
+    "api requests": ("*_api_requests.*_count",),
+    "api startup us": ("api_server.process_startup_time_us",),
+    "missed metrics": ("logger.missed_metrics_count",),
+}
+LOG_COLUMNS = ("log lines", "log warnings", "log errors")
+# Metrics that hold a value rather than a count since the previous flush
+STORE_METRICS = ("api_server.*", "latencies_us.*")
+# Level of a log line of Firecracker, e.g. "[anonymous-instance:WARN:...]"
+LOG_LEVEL = re.compile(r"\[[^\]]*:(WARN|ERROR)[:\]]")
+READ_SIZE = 65536
+# Partial flushes are never this large, the instance is corrupt otherwise
+MAX_BUFFER = 1 << 20
+
+
+def flatten(metrics: dict, prefix: str = "") -> dict:
+    """Flatten nested metrics to {"group.metric": value}"""
+    flat = {}
+
+    for key, value in metrics.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, prefix + key + "."))
+        elif isinstance(value, (int, float)):
+            flat[prefix + key] = value
+
+    return flat
+
+
+class Instance:
+    """Metrics and log counters of a single microVM"""
+
+    decoder = json.JSONDecoder()
+
+    def __init__(self, iid: str):
+        self.iid = iid
+        self.metrics = {}
+        self.flushes = 0
+        self.log = [0] * len(LOG_COLUMNS)
+        self.fds = set()
+        # (path, inode) of the opened FIFOs, removed when finished
+        self.fifos = []
+        self.buffers = {}
+
+    def add_flush(self, flush: dict) -> None:
+        for key, value in flatten(flush).items():
+            if any(fnmatch.fnmatchcase(key, p) for p in STORE_METRICS):
+                self.metrics[key] = max(self.metrics.get(key, value), value)
+            else:
+                self.metrics[key] = self.metrics.get(key, 0) + value
+
+        self.flushes += 1
+
+    def feed_metrics(self, fd: int, data: bytes) -> None:
+        """Decode all complete JSON objects, keep the remainder"""
+        text = self.buffers.get(fd, "") + data.decode(errors="replace")
+
+        while True:
+            text = text.lstrip()
+            if not text:
+                break
+            try:
+                flush, end = self.decoder.raw_decode(text)
+            except json.JSONDecodeError:
+                # Incomplete, wait for the rest
+                break
+            if isinstance(flush, dict):
+                self.add_flush(flush)
+            text = text[end:]
+
+        if len(text) > MAX_BUFFER:
+            print("Instance {}: dropped {} bytes of malformed metrics".format(
+                self.iid, len(text)), file=sys.stderr)
+            text = ""
+
+        self.buffers[fd] = text
+
+    def feed_log(self, fd: int, data: bytes) -> None:
+        """Count complete lines, keep the remainder"""
+        lines = (self.buffers.get(fd, "") + data.decode(errors="replace")).split("\n")
+        self.buffers[fd] = lines.pop()
+
+        for line in lines:
+            self.count_log(line)
+
+    def count_log(self, line: str) -> None:
+        if not line.strip():
+            return
+
+        self.log[0] += 1
+        level = LOG_LEVEL.search(line)
+        if level:
+            self.log[1 if level.group(1) == "WARN" else 2] += 1
+
+    def summary(self) -> list:
+        values = [self.iid, self.flushes]
+
+        for patterns in VMM_COLUMNS.values():
+            matches = [v for k, v in self.metrics.items()
+                       if any(fnmatch.fnmatchcase(k, p) for p in patterns)]
+            values.append(sum(matches) if matches else "")
+
+        return values + self.log
+
+
+class Collector:
+    """Reads the FIFOs of all microVMs with a single epoll instance"""
+
+    def __init__(self, directory: str, output):
+        self.directory = directory
+        self.output = output
+        self.epoll = select.epoll()
+        # fd: (instance, is metrics FIFO)
+        self.fds = {}
+        self.instances = {}
+        self.written = 0
+
+        control = path.join(directory, CONTROL_FIFO)
+        if not path.exists(control):
+            os.mkfifo(control)
+        # Opened for writing as well, so that it does not reach EOF when a
+        # launcher closes it
+        self.control = os.open(control, os.O_RDWR | os.O_NONBLOCK)
+        self.control_buffer = b""
+        self.epoll.register(self.control, select.EPOLLIN)
+
+        self.output.write(", ".join([COLUMN_INSTANCE, COLUMN_FLUSHES]
+                                    + list(VMM_COLUMNS) + list(LOG_COLUMNS))
+                          + "\n")
+        self.output.flush()
+
+    def add(self, iid: str, metrics: str, log: str) -> None:
+        if iid in self.instances:
+            self.finish(self.instances[iid])
+
+        instance = Instance(iid)
+        self.instances[iid] = instance
+
+        for fifo, is_metrics in ((metrics, True), (log, False)):
+            # Does not wait for Firecracker to open the other end, the FIFO
+            # only hangs up once Firecracker opened and closed it
+            try:
+                fd = os.open(fifo, os.O_RDONLY | os.O_NONBLOCK)
+            except OSError as e:
+                print("Instance {}: cannot open {}: {}".format(iid, fifo, e),
+                      file=sys.stderr)
+                continue
+            self.fds[fd] = (instance, is_metrics)
+            instance.fds.add(fd)
+            instance.fifos.append((fifo, os.fstat(fd).st_ino))
+            self.epoll.register(fd, select.EPOLLIN)
+
+    def read(self, fd: int) -> bool:
+        """Read everything that is available, returns False at EOF"""
+        instance, is_metrics = self.fds[fd]
+
+        while True:
+            try:
+                data = os.read(fd, READ_SIZE)
+            except BlockingIOError:
+                return True
+            if not data:
+                return False
+            if is_metrics:
+                instance.feed_metrics(fd, data)
+            else:
+                instance.feed_log(fd, data)
+
+    def close(self, fd: int) -> None:
+        instance, is_metrics = self.fds.pop(fd)
+        instance.fds.discard(fd)
+        self.epoll.unregister(fd)
+        os.close(fd)
+
+        rest = instance.buffers.pop(fd, "")
+        if not is_metrics:
+            instance.count_log(rest)
+        elif rest.strip():
+            print("Instance {}: incomplete metrics flush".format(instance.iid),
+                  file=sys.stderr)
+
+    def hangup(self, fd: int) -> None:
+        """The writer of fd is gone, the instance is done with both FIFOs"""
+        instance = self.fds[fd][0]
+        self.close(fd)
+
+        if not instance.fds:
+            self.finish(instance)
+
+    def finish(self, instance: Instance) -> None:
+        for fd in list(instance.fds):
+            self.read(fd)
+            self.close(fd)
+
+        for fifo, inode in instance.fifos:
+            # Unless a new VM with the same ID already created it again
+            try:
+                if os.stat(fifo).st_ino == inode:
+                    os.unlink(fifo)
+            except OSError:
+                pass
+        instance.fifos = []
+
+        if self.instances.get(instance.iid) is instance:
+            del self.instances[instance.iid]
+            self.output.write(", ".join(str(v) for v in instance.summary())
+                              + "\n")
+            self.written += 1
+
+    def control_message(self, line: str) -> None:
+        split = line.split()
+
+        if len(split) == 4 and split[0] == "add":
+            self.add(*split[1:])
+        elif len(split) == 2 and split[0] == "release":
+            # Firecracker exited, everything it wrote is in the FIFOs
+            if split[1] in self.instances:
+                self.finish(self.instances[split[1]])
+        elif split:
+            print("Unknown control message: {}".format(line), file=sys.stderr)
+
+    def read_control(self) -> None:
+        while True:
+            try:
+                data = os.read(self.control, READ_SIZE)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            self.control_buffer += data
+
+        *lines, self.control_buffer = self.control_buffer.split(b"\n")
+        for line in lines:
+            self.control_message(line.decode(errors="replace"))
+
+    def run(self) -> None:
+        """Collect until interrupted"""
+        while True:
+            for fd, events in self.epoll.poll():
+                if fd == self.control:
+                    self.read_control()
+                elif fd in self.fds and not self.read(fd):
+                    self.hangup(fd)
+
+            # Rows of finished instances are flushed once per batch of events
+            self.output.flush()
+
+    def stop(self) -> None:
+        """Write the rows of the instances that are still running"""
+        for instance in list(self.instances.values()):
+            self.finish(instance)
+
+        self.output.flush()
+        self.epoll.close()
+        os.close(self.control)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__PROGRAM_DESCRIPTION__)
+
+    arg_parser.add_argument("-d", "--directory", required=True, type=str,
+                            help="Directory of the FIFOs, with the control FIFO " + CONTROL_FIFO)
+    arg_parser.add_argument("-o", "--output", default="vmm.txt", type=str,
+                            help="File to write a row per microVM to")
+
+    args = arg_parser.parse_args()
+
+    os.makedirs(args.directory, exist_ok=True)
+
+    with open(args.output, "w") as f:
+        collector = Collector(args.directory, f)
+
+        print("Collecting microVM metrics in {}".format(args.directory),
+              file=sys.stderr)
+
+        try:
+            collector.run()
+        except KeyboardInterrupt:
+            print("Received interrupt, exiting...", file=sys.stderr)
+
+        collector.stop()
+
+    print("Collected metrics of {} microVMs".format(collector.written),
+          file=sys.stderr)
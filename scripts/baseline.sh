@@ -2,8 +2,12 @@
 
 ### This script determines a baseline for the execution times of both the 
 ### workload and the microVM as a whole. For this, an x amount of instances will
-### be fired up sequentially and of each instance both executions times will be 
-### recorded.
+### be fired up for every workload-argument pair and of each instance both 
+### executions times will be recorded.
+###
+### Pairs can be run in parallel, in which case every pair is pinned to its own
+### core. A pair stops early once the confidence intervals of both tFC and tVM 
+### have converged.
 ###
 ### Author:     N.J.L. Boonstra
 ###     2020 (c)
@@ -13,10 +17,20 @@ myLoc=${0%${0##*/}}
 #script standalone
 kernelLoc="${1:-"$myLoc/../resources/vmlinux"}"
 fsLoc="${2:-"$myLoc/../resources/rootfs.ext4"}"
-workloadsFile="${3:-"$myLoc/../parameters/workloads.txt"}"
+workloadsFile="${3:-"$myLoc/../parameters/workloads.manifest"}"
 #Number of times each workload must be run
 num=${4:-10}
 wargs=${5:-"$myLoc/../parameters/baseline-arguments.txt"}
+#Number of pairs that are run at the same time, each pinned to its own core
+jobs=${6:-1}
+#Stop a pair once the 95% confidence interval of tFC and tVM is within this
+#fraction of the mean (e.g. 0.02 for 2%). 0 disables this, always run $num times
+ciTarget=${7:-0}
+#Minimal amount of runs for each pair
+minRuns=5
+
+source $myLoc/commands.sh
+source $myLoc/cgroup.sh
 
 if [[ "$wargs" == "" ]]; then
     echo "Please specify workload arguments." 1>&2
@@ -35,10 +49,11 @@ fi
 
 OLDIFS=$IFS
 #Read the workloads
-IFS=$'\n'; workloads=($(cat $workloadsFile))
+IFS=$'\n'; workloads=($(read_workloads $workloadsFile))
 
 #Read the arguments for each workload from the warg file
 IFS=$'\n'; workloadargs=($(cat $wargs))
+IFS=$OLDIFS
 
 
 # OLDIFS=$IFS
@@ -52,16 +67,115 @@ IFS=$'\n'; workloadargs=($(cat $wargs))
 # fi
 
 #Set minimal amount of instances to 5 (more is usually better though)
-if [[ $num -lt 5 ]]; then
-    echo "The minimal value of instances is 5, but got $1." 1>&2
-    echo "Execution will be continued with 5 as the number of instances." 1>&2
-    num=5
+if [[ $num -lt $minRuns ]]; then
+    echo "The minimal value of instances is $minRuns, but got $num." 1>&2
+    echo "Execution will be continued with $minRuns as the number of instances." 1>&2
+    num=$minRuns
 fi
 
-idx=0
+#Determine the cores the pairs are pinned to
+cores=( $(benchmark_cores) )
+which taskset > /dev/null
+hasTaskset=$?
+
+#With placement, the pairs are pinned through the cpuset of their VM cgroups
+if ! placement_enabled && [[ $hasTaskset -ne 0 ]]; then
+    #Unpinned parallel pairs would disturb each other
+    echo "taskset not found, pairs will not be pinned and are run one at a time!" 1>&2
+    cores=()
+    jobs=1
+fi
+
+if [[ ${#cores[@]} -gt 0 && $jobs -gt ${#cores[@]} ]]; then
+    echo "Only ${#cores[@]} cores available, running $jobs pairs in parallel would share cores." 1>&2
+    echo "Execution will be continued with ${#cores[@]} parallel pairs." 1>&2
+    jobs=${#cores[@]}
+fi
+
+if [[ $jobs -lt 1 ]]; then
+    jobs=1
+fi
+
+#Returns 0 when the CI target is a number greater than 0, e.g. not "0.00"
+ci_enabled() {
+    awk -v t="$ciTarget" 'BEGIN { exit !(t + 0 > 0) }'
+}
+
+#Returns 0 when the relative half-width of the 95% confidence interval of all
+#values is at most $ciTarget
+is_converged() {
+    echo "$@" | awk -v target="$ciTarget" '
+    BEGIN {
+        #Two-sided t-values for 95% confidence, indexed by degrees of freedom
+        split("12.706 4.303 3.182 2.776 2.571 2.447 2.365 2.306 2.262 2.228 2.201 2.179 2.160 2.145 2.131 2.120 2.110 2.101 2.093 2.086 2.080 2.074 2.069 2.064 2.060 2.056 2.052 2.048 2.045 2.042", tval, " ")
+    }
+    {
+        n = NF; sum = 0; sq = 0
+        for (i = 1; i <= NF; ++i) { sum += $i }
+        mean = sum / n
+        for (i = 1; i <= NF; ++i) { sq += ($i - mean) ^ 2 }
+        t = (n - 1 <= 30) ? tval[n - 1] : 1.960
+        hw = t * sqrt(sq / (n - 1)) / sqrt(n)
+        #A mean of 0 (e.g. tVM of tiny workloads) can not get any more precise
+        if (mean == 0 || hw / mean <= target) { exit 0 }
+        exit 1
+    }'
+}
+
+#Run all runs of a single pair, pinned to core $4 if given.
+#Writes the result lines to stdout
+run_pair() {
+    local pairIdx=$1 wno=$2 arg=$3 core=$4
+    local workload=${workloads[$wno]}
+    local fcTimes=() vmTimes=()
+    local pin=()
+
+    if [[ -n "$core" ]] && placement_enabled; then
+        #start.sh confined itself to the host cores, taskset can not leave
+        #those, the cpuset of the VM cgroup can
+        pin=( env FC_CPUS=$core )
+    elif [[ -n "$core" ]]; then
+        pin=( taskset -c $core )
+    else
+        core=-1
+    fi
+
+    for (( i=0; i < num; ++i )); do
+        #fcIDs must be unique over all parallel pairs, as they name the socket
+        IFS=$OLDIFS; declare -A res=()
+        read_launch_output res < <( "${pin[@]}" $myLoc/launch-firecracker.sh $kernelLoc $fsLoc "b${pairIdx}-${i}" $workload $arg t )
+        #Execution times in ms
+        fctime=${res[fc]}
+        vmtime=${res[mVM]}
+
+        #A failed launch is no sample, it would skew the mean and the CI
+        if [[ -z "$fctime" || -z "$vmtime" ]]; then
+            echo "${workload},${arg} run ${i} on core ${core}: no runtime reported, skipped" 1>&2
+            continue
+        fi
+
+        echo "${workload},${arg} run ${i} on core ${core}: ${fctime} and ${vmtime}" 1>&2
+        echo "${wno},${arg},${i},${fctime},${vmtime},${core},$(telemetry_csv "${res[telemetry]}"),$(workload_metrics_csv "${res[metrics]}")"
+
+        fcTimes+=( $fctime )
+        vmTimes+=( $vmtime )
+
+        if [[ $useCI -eq 1 && ${#fcTimes[@]} -ge $minRuns ]] \
+            && is_converged "${fcTimes[@]}" && is_converged "${vmTimes[@]}"; then
+            echo "${workload},${arg} converged after ${#fcTimes[@]} runs" 1>&2
+            break
+        fi
+    done
+}
 
-echo "workloadID, workload argument, run, tFC, tVM"
+useCI=0
+if ci_enabled; then
+    useCI=1
+fi
 
+#Collect the valid pairs first, so that every pair has a fixed index
+pairs=()
+IFS=$'\n'
 for workloadarg in ${workloadargs[@]}; do
     # Skip comments
     if [[ "${workloadarg:0:1}" == "#" ]]; then
@@ -74,29 +188,36 @@ for workloadarg in ${workloadargs[@]}; do
     workload=${workloads[$wno]}
 
     # Invalid workload -> workload is undefined -> skip this
-    if [[ -z "$workload" ]]; then
+    if [[ -z "$workload" || "$workload" == "-" ]]; then
         echo "Invalid workload number: $wno" 1>&2
         continue
     fi
 
-    echo "${workload},${arg}" 1>&2
+    pairs+=( "$wno,$arg" )
+done
+IFS=$OLDIFS
+
+#Every parallel job writes the results of its pairs to a separate file
+tmpResults="$(mktemp -d /tmp/fc-baseline.XXXXXX)"
+
+#Job j runs pairs j, j + jobs, j + 2*jobs, ... on core j, this keeps both the
+#pair to core mapping and the output deterministic
+for (( j=0; j < jobs; ++j )); do
+    (
+        core=${cores[$j]}
+        for (( p=j; p < ${#pairs[@]}; p += jobs )); do
+            IFS=$','; split=( ${pairs[$p]} ); IFS=$OLDIFS
+            run_pair $p ${split[0]} ${split[1]} $core > "$tmpResults/pair-$p.txt"
+        done
+    )&
+done
 
-    tottime=0
-    vmtottime=0
+wait
 
-    for (( i=0; i < num; ++i )); do
-        IFS=$OLDIFS; declare -a times=( $( { $myLoc/launch-firecracker.sh $kernelLoc $fsLoc $i $workload $arg t; } )) 
-        #Fetch times and force base10 by stripping the dotsign.
-        # TODO: now I assume that both times are equally precise, but this is 
-        # not necessarily the case
-        fctime=${times[1]//[^0-9]/}
-        fctime=$(( 10#$fctime ))
-        vmtime=${times[3]//[^0-9]/}
-        vmtime=$(( 10#$vmtime ))
-
-        echo "Run ${i}: ${fctime} and ${vmtime}" 1>&2
-        echo "${wno},${arg},${i},${fctime},${vmtime}"
-    done
-    ((++idx))
+echo "workloadID, workload argument, run, tFC, tVM, core, $TELEMETRY_HEADER, $WORKLOAD_METRIC_HEADER"
+
+for (( p=0; p < ${#pairs[@]}; ++p )); do
+    cat "$tmpResults/pair-$p.txt"
 done
 
+rm -rf "$tmpResults"
@@ -5,12 +5,40 @@ myLoc=${0%${0##*/}}
 #script standalone
 kernelLoc="${1:-"$myLoc/../resources/vmlinux"}"
 fsLoc="${2:-"$myLoc/../resources/rootfs.ext4"}"
-workloadsFile="${3:-"$myLoc/../parameters/workloads.txt"}"
+workloadsFile="${3:-"$myLoc/../parameters/workloads.manifest"}"
 #num is the amount of instances that may be active at the same moment
 num=${4:-1000}
 wargs="${5:-"$myLoc/../workloads/benchmark-arguments.txt"}"
 isPoisson=${6:-0}
 
+source $myLoc/commands.sh
+source $myLoc/cgroup.sh
+
+#Launches one microVM, can be replaced by a stub (e.g. processing/stub_launcher.py)
+#that takes the same arguments, to test the benchmark without KVM
+launcher="${FC_LAUNCHER:-$myLoc/launch-firecracker.sh}"
+
+#Report events to the live metrics exporter (processing/live_metrics.py), if
+#it is running. FC_METRICS_PID is the exporter, a FIFO of a dead exporter would
+#block once it is full.
+metricsFd=""
+if [[ -n "$FC_METRICS_FIFO" && -p "$FC_METRICS_FIFO" ]]; then
+    if [[ -n "$FC_METRICS_PID" ]] && ! kill -0 $FC_METRICS_PID 2> /dev/null; then
+        echo "Live metrics exporter is not running, live metrics disabled" 1>&2
+    else
+        #Read-write, so that opening does not wait for a reader
+        exec {metricsFd}<> "$FC_METRICS_FIFO"
+    fi
+fi
+
+#Lines are written at once, so events of parallel instances do not mix
+metrics_event() {
+    if [[ -n "$metricsFd" ]]; then
+        if [[ -z "$FC_METRICS_PID" ]] || kill -0 $FC_METRICS_PID 2> /dev/null; then
+            echo "$*" >&$metricsFd
+        fi
+    fi
+}
 
 fileResults="$myLoc/../results/results-${wargs##*/}"
 
@@ -18,10 +46,16 @@ fileResults="$myLoc/../results/results-${wargs##*/}"
 OLDIFS=$IFS
 
 IFS=$'\n'
-workloads=( $(cat $workloadsFile ) )
+workloads=( $(read_workloads $workloadsFile ) )
 workloadargs=( $(cat $wargs ) )
 
-echo "workloadID, workload argument, tFC, tVM, start time" >> $fileResults
+if placement_enabled; then
+    placement_init
+    echo "Placing instances with policy $FC_PLACEMENT on cores ${placementCores[*]}" 1>&2
+    echo "workloadID, workload argument, tFC, tVM, start time, $TELEMETRY_HEADER, $WORKLOAD_METRIC_HEADER, instance, cpuset, mems" >> $fileResults
+else
+    echo "workloadID, workload argument, tFC, tVM, start time, $TELEMETRY_HEADER, $WORKLOAD_METRIC_HEADER, instance" >> $fileResults
+fi
 
 idx=0
 for workloadarg in ${workloadargs[@]}; do
@@ -35,7 +69,7 @@ for workloadarg in ${workloadargs[@]}; do
     #Unset to avoid weird behavior later on
     unset IFS
 
-    if [[ -z "$workload" ]]; then
+    if [[ -z "$workload" || "$workload" == "-" ]]; then
         echo "Invalid workload number: $workloadnum" 1>&2
         continue
     fi
@@ -44,6 +78,17 @@ for workloadarg in ${workloadargs[@]}; do
     # Increment here, does not work in subshell
     thisId=$((idx++))
 
+    placement=""
+    if placement_enabled; then
+        placement=( $(placement_for $thisId) )
+    fi
+
+    interval=0
+    if [[ isPoisson -eq 1 ]]; then
+        interval=$sleeptime
+    fi
+    metrics_event "scheduled $thisId ${EPOCHREALTIME:-$(date +%s.%N)} $interval"
+
     #Run this in a subshell for parallel execution
     (
         #Start time in milliseconds from epoch (for data processing)
@@ -51,20 +96,31 @@ for workloadarg in ${workloadargs[@]}; do
         mywarg=$warg
         #Save a local copy of workloadnum
         myworknum=$workloadnum
-        declare -a res=( $( $myLoc/launch-firecracker.sh $kernelLoc $fsLoc $thisId $workload $warg t ) )
-        #Process execution times
-        fctime=${res[1]//[^0-9]/}
-        fctime=${fctime#"${fctime%%[!0]*}"}
-        fctime=$(( 10#$fctime ))
-        vmtime=${res[3]//[^0-9]/}
-        vmtime=${vmtime#"${vmtime%%[!0]*}"}
-        vmtime=$(( 10#$vmtime ))
+        declare -A res
+        metrics_event "started $thisId"
+        read_launch_output res < <( FC_CPUS=${placement[0]} FC_MEMS=${placement[1]} $launcher $kernelLoc $fsLoc $thisId $workload $warg t )
+        #Execution times in ms, empty if the VM did not report them
+        fctime=${res[fc]}
+        vmtime=${res[mVM]}
+        telemetry=$(telemetry_csv "${res[telemetry]}")
+        wmetrics=$(workload_metrics_csv "${res[metrics]}")
+
+        if [[ -n "$fctime" && -n "$vmtime" ]]; then
+            metrics_event "completed $thisId $fctime $vmtime"
+        else
+            metrics_event "failed $thisId"
+        fi
 
         
         #Write results to the resultsfile
         #TODO: check if this does not result in data loss due to concurrent 
         #       writes
-        echo "$myworknum,$mywarg,$fctime,$vmtime,$starttime" >> $fileResults
+        if [[ -n "$placement" ]]; then
+            #cpusets may contain commas, store them space separated
+            echo "$myworknum,$mywarg,$fctime,$vmtime,$starttime,$telemetry,$wmetrics,$thisId,${placement[0]//,/ },${placement[1]}" >> $fileResults
+        else
+            echo "$myworknum,$mywarg,$fctime,$vmtime,$starttime,$telemetry,$wmetrics,$thisId" >> $fileResults
+        fi
 
     )&
 
@@ -0,0 +1,142 @@
+#!/bin/bash
+
+### Functions to place microVMs in cgroup v2 slices. Sourced by start.sh,
+### benchmark.sh and launch-firecracker.sh.
+###
+### Placement is configured through the following (exported) variables:
+###     FC_PLACEMENT    Placement policy: none, roundrobin, packed or numa.
+###                     When empty, no cgroups are used at all.
+###     FC_CPU_MAX      Value written to cpu.max of each VM, default: "max 100000"
+###     FC_MEM_MAX      Value written to memory.max of each VM, default: "max"
+###     FC_PACK         Number of VMs placed on one core by "packed", default: 4
+### And per launched VM:
+###     FC_CPUS         cpuset.cpus of the VM, default: all benchmark cores
+###     FC_MEMS         cpuset.mems of the VM, default: all memory nodes
+
+CG_ROOT="/sys/fs/cgroup/fc-microbenchmark"
+CG_RUNNER="$CG_ROOT/runner"
+declare -a placementCores=()
+declare -a placementNodes=()
+
+placement_enabled() {
+    [[ -n "$FC_PLACEMENT" ]] && return 0 || return 1
+}
+
+#Create the delegated cgroup tree and move the calling shell (and thus all
+#processes started from it afterwards) into the runner leaf, which is confined
+#to the cores that are not used by the VMs.
+cgroup_init() {
+    local HOSTCORES=() HOSTCPUS CORE
+    local POOL=" $(benchmark_cores) "
+    local IFS=$' \t\n'
+
+    for CORE in $(expand_cpu_list "$(cat /sys/devices/system/cpu/online)"); do
+        if [[ ! "$POOL" =~ " $CORE " ]]; then
+            HOSTCORES+=( $CORE )
+        fi
+    done
+    HOSTCPUS="${HOSTCORES[*]}"
+
+    if [[ ! -e /sys/fs/cgroup/cgroup.controllers ]]; then
+        echo "cgroup v2 is not mounted on /sys/fs/cgroup!" 1>&2
+        return 1
+    fi
+
+    sudo mkdir -p "$CG_RUNNER"
+    echo "+cpuset +cpu +memory" | sudo tee /sys/fs/cgroup/cgroup.subtree_control > /dev/null
+    #Delegate the subtree, VMs can then be (re)moved without root
+    sudo chown -R "$(id -u):$(id -g)" "$CG_ROOT"
+    echo "+cpuset +cpu +memory" > "$CG_ROOT/cgroup.subtree_control"
+
+    if [[ -n "$HOSTCPUS" ]]; then
+        echo "${HOSTCPUS// /,}" > "$CG_RUNNER/cpuset.cpus"
+    fi
+
+    echo $$ | sudo tee "$CG_RUNNER/cgroup.procs" > /dev/null
+}
+
+#Determine the cores and NUMA nodes VMs are placed on
+placement_init() {
+    local NODE CPUS CORE NODECORES
+    local IFS=$' \t\n'
+
+    placementCores=( $(benchmark_cores) )
+    placementNodes=()
+
+    for NODE in /sys/devices/system/node/node[0-9]*; do
+        [[ -e "$NODE/cpulist" ]] || continue
+        #Only keep the benchmark cores of every node
+        NODECORES=()
+        for CORE in $(expand_cpu_list "$(cat $NODE/cpulist)"); do
+            if [[ " ${placementCores[@]} " =~ " $CORE " ]]; then
+                NODECORES+=( $CORE )
+            fi
+        done
+        if [[ ${#NODECORES[@]} -gt 0 ]]; then
+            CPUS="${NODECORES[*]}"
+            placementNodes+=( "${NODE##*node}:${CPUS// /,}" )
+        fi
+    done
+}
+
+#Print the cpuset and memory nodes of instance $1 as "cpus mems", according to
+#the placement policy. Requires placement_init to be called first.
+placement_for() {
+    local IDX=$1
+    local NCORES=${#placementCores[@]}
+    local ALL="${placementCores[*]}"
+    local NODE
+
+    case "$FC_PLACEMENT" in
+        roundrobin )
+            echo "${placementCores[$(( IDX % NCORES ))]} -"
+            ;;
+        packed )
+            echo "${placementCores[$(( (IDX / ${FC_PACK:-4}) % NCORES ))]} -"
+            ;;
+        numa )
+            if [[ ${#placementNodes[@]} -eq 0 ]]; then
+                echo "${ALL// /,} -"
+            else
+                NODE=${placementNodes[$(( IDX % ${#placementNodes[@]} ))]}
+                echo "${NODE#*:} ${NODE%%:*}"
+            fi
+            ;;
+        * )
+            echo "${ALL// /,} -"
+            ;;
+    esac
+}
+
+#Create the cgroup of a single VM, named $1
+cgroup_vm_create() {
+    local CG="$CG_ROOT/$1"
+
+    mkdir -p "$CG" || return 1
+
+    if [[ -n "$FC_CPUS" ]]; then
+        echo "$FC_CPUS" > "$CG/cpuset.cpus"
+    fi
+    if [[ -n "$FC_MEMS" && "$FC_MEMS" != "-" ]]; then
+        echo "$FC_MEMS" > "$CG/cpuset.mems"
+    fi
+    echo "${FC_CPU_MAX:-"max 100000"}" > "$CG/cpu.max"
+    echo "${FC_MEM_MAX:-"max"}" > "$CG/memory.max"
+}
+
+cgroup_vm_remove() {
+    rmdir "$CG_ROOT/$1" 2> /dev/null
+}
+
+#Execute a command in the cgroup $1, must be called in a subshell as it
+#replaces the calling shell. Without placement, only executes the command.
+cgroup_exec() {
+    local CG="$1"
+    shift
+
+    if placement_enabled; then
+        echo $BASHPID > "$CG_ROOT/$CG/cgroup.procs"
+    fi
+
+    exec "$@"
+}
@@ -1,22 +1,24 @@
 #!/bin/bash
 
 #Sourced from https://github.com/firecracker-microvm/firecracker-demo/
-CURL=(curl --silent --show-error --header "Content-Type: application/json" --unix-socket "$fcSock" --write-out "HTTP %{http_code}")
+#The socket is added in curl_put, as $fcSock may change after sourcing this file
+CURL=(curl --silent --show-error --header "Content-Type: application/json" --write-out "HTTP %{http_code}")
 
 curl_put() {
     local URL_PATH="$1"
     local OUTPUT RC
-    OUTPUT="$("${CURL[@]}" -X PUT --data @- "http://localhost/${URL_PATH#/}" 2>&1)"
+    OUTPUT="$("${CURL[@]}" --unix-socket "$fcSock" -X PUT --data @- "http://localhost/${URL_PATH#/}" 2>&1)"
     RC="$?"
+    #Errors go to stderr, stdout of a timed launch is parsed
     if [ "$RC" -ne 0 ]; then
-        echo "Error: curl PUT ${URL_PATH} failed with exit code $RC, output:"
-        echo "$OUTPUT"
+        echo "Error: curl PUT ${URL_PATH} failed with exit code $RC, output:" 1>&2
+        echo "$OUTPUT" 1>&2
         return 1
     fi
     # Error if output doesn't end with "HTTP 2xx"
     if [[ "$OUTPUT" != *HTTP\ 2[0-9][0-9] ]]; then
-        echo "Error: curl PUT ${URL_PATH} failed with non-2xx HTTP status code, output:"
-        echo "$OUTPUT"
+        echo "Error: curl PUT ${URL_PATH} failed with non-2xx HTTP status code, output:" 1>&2
+        echo "$OUTPUT" 1>&2
         return 1
     fi
 }
@@ -35,12 +37,130 @@ exit_with_message() {
   exit $ERR
 }
 
+#Print the names of the workloads in a workload manifest, one per line, such
+#that the line number is the workload ID. IDs without a workload print "-".
+#Plain lists of names (the old workloads.txt) are printed as they are.
+read_workloads() {
+    awk -F', *' '
+        /^[[:space:]]*#/ || NF == 0 { next }
+        NF >= 3 { names[$1] = $2; if ($1 > max) max = $1; next }
+        { names[n++] = $1; max = n - 1 }
+        END { for (i = 0; i <= max; ++i) print (i in names) ? names[i] : "-" }' "$1"
+}
+
+#Convert the output of time with TIMEFORMAT="%3R" (e.g. 0.305) to integer ms
+seconds_to_ms() {
+    local SECONDS_PART=${1%%.*} FRACTION=${1#*.}
+    echo $(( 10#${SECONDS_PART:-0} * 1000 + 10#${FRACTION:-0} ))
+}
+
+#Read the output of launch-firecracker.sh in timed mode ("key: value" lines)
+#from stdin into the associative array named $1, e.g. RESULT[fc]
+read_launch_output() {
+    local -n RESULT=$1
+    local KEY VALUE
+    local IFS=$' \t\n'
+
+    while read -r KEY VALUE; do
+        RESULT[${KEY%:}]="$VALUE"
+    done
+}
+
+#Fields of the WORKLOADTELEMETRY record that are stored in the results, the
+#CSV columns are named in TELEMETRY_HEADER
+TELEMETRY_FIELDS=( boot init start end cpu )
+TELEMETRY_HEADER="tBoot, tInit, tStart, tEnd, tCPU"
+
+#Metrics the workloads report themselves in their WORKLOADMETRICS record:
+#bandwidth in MB/s, throughput in operations/s and latency in ns. Every
+#workload reports the ones that apply to it
+WORKLOAD_METRIC_FIELDS=( bandwidth throughput latency )
+WORKLOAD_METRIC_HEADER="bandwidth, throughput, latency"
+
+#Convert a record "name=value name=value ..." to CSV values in the order of the
+#given field names, missing fields are left empty
+record_csv() {
+    local -A VALUES
+    local FIELD OUT=""
+    local IFS=$' \t\n'
+
+    for FIELD in $1; do
+        VALUES[${FIELD%%=*}]=${FIELD#*=}
+    done
+    shift
+    for FIELD in "$@"; do
+        OUT+="${VALUES[$FIELD]},"
+    done
+
+    echo "${OUT%,}"
+}
+
+#Convert a telemetry record "boot=.. init=.. ..." to CSV values in the order of
+#TELEMETRY_FIELDS
+telemetry_csv() {
+    record_csv "$1" "${TELEMETRY_FIELDS[@]}"
+}
+
+#Convert a metrics record "bandwidth=.. ..." to CSV values in the order of
+#WORKLOAD_METRIC_FIELDS
+workload_metrics_csv() {
+    record_csv "$1" "${WORKLOAD_METRIC_FIELDS[@]}"
+}
+
+#Expand a kernel cpu list (e.g. "0-3,8,10-11") into space separated core ids
+expand_cpu_list() {
+    local LIST="$1"
+    local RANGE START END
+    local OLDIFS=$IFS
+
+    IFS=$','
+    for RANGE in $LIST; do
+        RANGE=${RANGE//[^0-9-]/}
+        if [[ -z "$RANGE" ]]; then
+            continue
+        fi
+        START=${RANGE%%-*}
+        END=${RANGE##*-}
+        for (( c=START; c <= END; ++c )); do
+            echo -n "$c "
+        done
+    done
+    IFS=$OLDIFS
+}
+
+#Cores that may be used to pin benchmark processes to. Prefers the cores
+#isolated with isolcpus=, otherwise all online cores except core 0, which is
+#left to the host (sysmon, bash, curl).
+benchmark_cores() {
+    local ISOLATED ONLINE CORES
+    local IFS=$' \t\n'
+
+    ISOLATED="$(cat /sys/devices/system/cpu/isolated 2> /dev/null)"
+    if [[ -n "$ISOLATED" ]]; then
+        expand_cpu_list "$ISOLATED"
+        return 0
+    fi
+
+    ONLINE="$(cat /sys/devices/system/cpu/online 2> /dev/null)"
+    CORES=( $(expand_cpu_list "${ONLINE:-0}") )
+    if [[ ${#CORES[@]} -gt 1 ]]; then
+        echo "${CORES[@]:1}"
+    else
+        echo "${CORES[@]}"
+    fi
+}
+
 issue_commands() {
     local KERNEL_ARGS VERBOSE
     VERBOSE=${1:-"?"}
 
     KERNEL_WARG="warg=$workLoadArg softlevel=$workLoad"
 
+    #The fast-boot rootfs runs the workload from its own init, not OpenRC
+    if [[ -n "$FC_FAST_INIT" ]]; then
+        KERNEL_WARG="$KERNEL_WARG init=$FC_FAST_INIT"
+    fi
+
     KERNEL_STD_ARGS="reboot=k panic=1 pci=off"
 
     if [[ $1 -eq 1 ]]; then
@@ -50,14 +170,14 @@ issue_commands() {
     #Hackish solution to get warg in front all the time
     KERNEL_ARGS="$KERNEL_WARG $KERNEL_ARGS"
 
-curl_put '/boot-source' <<EOF
+curl_put '/boot-source' <<EOF || return 1
 {
   "kernel_image_path": "$kernelLocation",
   "boot_args": "$KERNEL_ARGS"
 }
 EOF
 
-curl_put '/machine-config' <<EOF
+curl_put '/machine-config' <<EOF || return 1
 {
  "vcpu_count": $cpuCount,
  "mem_size_mib": $memSize,
@@ -65,7 +185,7 @@ curl_put '/machine-config' <<EOF
 }
 EOF
 
-curl_put '/drives/1' <<EOF
+curl_put '/drives/1' <<EOF || return 1
 {
   "drive_id": "1",
   "path_on_host": "$fsLocation",
@@ -76,7 +196,7 @@ EOF
 
 if [[ -e "$writefsLocation" ]]; then
 
-curl_put '/drives/2' <<EOF
+curl_put '/drives/2' <<EOF || return 1
 {
   "drive_id": "2",
   "path_on_host": "$writefsLocation",
@@ -88,7 +208,23 @@ EOF
 
 fi
 
-curl_put '/actions' <<EOF
+#Metrics and log of Firecracker itself, see vmmmetrics.sh. Firecracker v0.21
+#configures both FIFOs through /logger, later versions split off /metrics
+if [[ -n "$vmmMetrics" && -n "$vmmLog" ]]; then
+
+curl_put '/logger' <<EOF || return 1
+{
+  "log_fifo": "$vmmLog",
+  "metrics_fifo": "$vmmMetrics",
+  "level": "Warning",
+  "show_level": true,
+  "show_log_origin": false
+}
+EOF
+
+fi
+
+curl_put '/actions' <<EOF || return 1
 {
   "action_type": "InstanceStart"
 }
@@ -5,6 +5,9 @@ defaultName="rootfs.ext4"
 
 #Argument values
 fsName="${1:-$defaultName}"
+#"fast" builds the fast-boot rootfs: no OpenRC, only busybox for the scripted
+#workloads, booted with init=/bin/fast-init
+variant="${2:-"openrc"}"
 
 #Determine current architecture
 arch="$(uname -m)"
@@ -54,12 +57,20 @@ sudo touch "$tmpDir/fs/etc/apk/repositories"
 echo "$alpineMirror/$alpineBranch/main" | sudo tee "$tmpDir/fs/etc/apk/repositories" > /dev/null
 echo "$alpineMirror/$alpineBranch/community" | sudo tee -a "$tmpDir/fs/etc/apk/repositories" > /dev/null
 
+if [[ "$variant" == "fast" ]]; then
+
+sudo $tmpDir/apk --root "$tmpDir/fs" --update-cache --initdb --allow-untrusted --arch ${arch} add alpine-baselayout busybox
+
+else
+
 sudo $tmpDir/apk --root "$tmpDir/fs" --update-cache --initdb --allow-untrusted --arch ${arch} add alpine-base util-linux openrc bash
 
-# Remove the spawning getty's
+# Remove the spawning getty's. The first entry marks kernel boot complete for
+# bin/run-workload-reboot, before OpenRC starts.
 cat <<EOF > ./inittab
 # /etc/inittab
 
+::sysinit:/bin/telemetry now > /tmp/boot.time
 ::sysinit:/sbin/openrc sysinit
 ::sysinit:/sbin/openrc boot
 ::wait:/sbin/openrc default
@@ -74,6 +85,8 @@ EOF
 sudo mv ./inittab "$tmpDir/fs/etc/inittab"
 sudo chown root:root "$tmpDir/fs/etc/inittab"
 
+fi
+
 echo "Unmounting..."
 sudo umount "$tmpDir/fs"
 
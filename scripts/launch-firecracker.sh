@@ -15,13 +15,16 @@ workLoadArg=${5:-"0"}
 cpuCount=1
 memSize=128
 fcSock="/tmp/firecracker-$fcID.socket"
-fcOutput="/tmp/firecracker-$fcID.output"
+fcCgroup="vm-$fcID"
 
 #Assert that 'time' always outputs 3-decimal precision
 TIMEFORMAT="%3R"
 
 #Import issue_commands
 source $myLocation/commands.sh
+source $myLocation/cgroup.sh
+source $myLocation/rundir.sh
+source $myLocation/vmmmetrics.sh
 
 check_file_exists $kernelLocation || exit_with_message "Cannot locate the kernel!" 1
 check_file_exists $fsLocation ||exit_with_message "Cannot locate the filesystem!" 1
@@ -47,7 +50,7 @@ elif [[ "$6" == "c" ]]; then
     asDeamon=0
     verbose=1
     echo "Issueing commands only"
-    issue_commands
+    issue_commands || exit 1
     exit 0
 elif [[ "$6" == "v" ]]; then
     #Do not daemonize and print to terminal
@@ -70,13 +73,67 @@ if [[ $? -eq 1 ]]; then
     exit 1
 fi
 
+#Timed VMs get their own runtime directory, the other modes keep the fixed
+#socket location, so that "c" can find it
+runDir=""
+if rundir_enabled && [[ $timeOutput -eq 1 ]]; then
+    runDir="$(rundir_create "$fcID" "$kernelLocation" "$fsLocation")" \
+        || exit_with_message "Cannot create a runtime directory in $FC_RUNDIR!" 1
+    kernelLocation="$runDir/vmlinux"
+    fsLocation="$runDir/rootfs.ext4"
+    fcSock="$runDir/api.socket"
+    #The directory name is unique, the fcID may not be
+    fcCgroup="${runDir##*/}"
+fi
+
+#Timed VMs write the metrics and log of Firecracker to FIFOs of the collector,
+#issue_commands configures them when these are set
+vmmMetrics=""
+vmmLog=""
+if vmmmetrics_enabled && [[ $timeOutput -eq 1 ]]; then
+    vmmFifos=( $(vmmmetrics_create "$fcID") ) \
+        || exit_with_message "Cannot create the metrics FIFOs in $FC_VMM_METRICS!" 1
+    vmmMetrics=${vmmFifos[0]}
+    vmmLog=${vmmFifos[1]}
+fi
 
-rm -rf "$fcSock"
+#Print the runtime, telemetry and metrics reported by the workload as
+#"mVM: <ms>", "telemetry: <fields>" and "metrics: <fields>", reading the
+#console from stdin
+parse_console() {
+    local line
+    while read -r line; do
+        line=${line%$'\r'}
+        if [[ "$line" == WORKLOADRUNTIME* ]]; then
+            echo "mVM: ${line##* }"
+        elif [[ "$line" == WORKLOADTELEMETRY* ]]; then
+            echo "telemetry: ${line#* }"
+        elif [[ "$line" == WORKLOADMETRICS* ]]; then
+            echo "metrics: ${line#* }"
+        fi
+    done
+}
+
+
+if [[ -z "$runDir" ]]; then
+    rm -rf "$fcSock"
+fi
+
+if placement_enabled; then
+    cgroup_vm_create "$fcCgroup" || exit_with_message "Cannot create cgroup $fcCgroup!" 1
+fi
 
 if [[ $timeOutput -ne 1 ]]; then
     echo "Launching Firecracker..."
 fi
 
+#Firecracker can not boot a VM that is not (fully) configured, stop it rather
+#than waiting for it forever
+abort_launch() {
+    echo "Could not configure microVM $fcID, aborting" 1>&2
+    pkill -f -- "--api-sock $fcSock\$"
+}
+
 pidIssuer=0
 
 if [[ $asDeamon -eq 0 ]]; then
@@ -85,7 +142,12 @@ if [[ $asDeamon -eq 0 ]]; then
         while [[ ! -e "$fcSock" ]]; do
             sleep 0.1s
         done
-        issue_commands $verbose
+        issue_commands $verbose || { abort_launch; exit 1; }
+
+        #Periodic metrics are opt-in, the issuer stays alive for them
+        if [[ -n "$vmmMetrics" && -n "$FC_VMM_FLUSH" ]]; then
+            vmmmetrics_flush "$FC_VMM_FLUSH"
+        fi
     )&
     #Capture the pid of the command issuer
     pidIssuer=$!
@@ -94,25 +156,44 @@ if [[ $asDeamon -eq 0 ]]; then
     if [[ $timeOutput -eq 1 ]]; then
         #Had to redirect firecracker output to null, as it sometimes throws a warning,
         #which messes up the processing of results
-        fctime=$( { time (firecracker --api-sock "$fcSock" 2>/dev/null); } 2>&1 > $fcOutput  )
-        #Remove the dot
-        fctime=${fctime//./}
-        echo "fc: $fctime"
-
-        vmtime="$(cat $fcOutput | grep WORKLOADRUNTIME)"
-        vmtime=${vmtime##* }
-        echo "mVM: $vmtime"
-        rm -rf $fcOutput
+        #The console is parsed while streaming, the records of the workload 
+        #are printed first, the output of time last
+        consoleOutput="$( { time (cgroup_exec "$fcCgroup" firecracker --api-sock "$fcSock" 2>/dev/null | parse_console); } 2>&1 )"
+        fctime=${consoleOutput##*$'\n'}
+        echo "fc: $(seconds_to_ms $fctime)"
+
+        if [[ "$consoleOutput" == *$'\n'* ]]; then
+            echo "${consoleOutput%$'\n'*}"
+        fi
     else
-        firecracker --api-sock "$fcSock"
+        (cgroup_exec "$fcCgroup" firecracker --api-sock "$fcSock")
     fi
 elif [[ $asDeamon -ne 0 ]]; then
-    firecracker --api-sock "$fcSock" &
+    #The outer subshell outlives this script and removes the cgroup once
+    #firecracker exited
+    (
+        (cgroup_exec "$fcCgroup" firecracker --api-sock "$fcSock")
+        if placement_enabled; then
+            cgroup_vm_remove "$fcCgroup"
+        fi
+    ) &
+
+    issue_commands $verbose || abort_launch
+fi
 
-    issue_commands $verbose
+if [[ -n "$runDir" ]]; then
+    rundir_release "$runDir"
+else
+    rm -rf "$fcSock"
 fi
 
-rm -rf "$fcSock"
+if [[ -n "$vmmMetrics" ]]; then
+    vmmmetrics_release "$fcID"
+fi
+
+if placement_enabled && [[ $asDeamon -eq 0 ]]; then
+    cgroup_vm_remove "$fcCgroup"
+fi
 
 #if we get here, then fc is already terminated, either because it is actually 
 #done, or it crashed. Either way, this script *must* terminate
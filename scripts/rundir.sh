@@ -0,0 +1,64 @@
+#!/bin/bash
+
+### Functions for per-VM runtime directories on a tmpfs. Sourced by start.sh
+### and launch-firecracker.sh.
+###
+### When FC_RUNDIR is set (start.sh -T), every timed microVM gets a directory
+### with a unique name below $FC_RUNDIR, holding its API socket and hard links
+### to the kernel and root filesystem. The kernel and root filesystem are staged
+### on the tmpfs once, so that the hard links do not cross filesystems.
+### Directories of finished VMs are moved to the trash, which is emptied in
+### batches by a background reaper, rather than removed by every VM.
+
+rundir_enabled() {
+    [[ -n "$FC_RUNDIR" ]] && return 0 || return 1
+}
+
+#Create $FC_RUNDIR and stage the kernel ($1) and root filesystem ($2) on it.
+#Prints the staged locations as "kernel rootfs".
+rundir_init() {
+    local KERNEL="$1" FS="$2"
+    local RESOURCES="$FC_RUNDIR/resources"
+
+    mkdir -p "$RESOURCES" "$FC_RUNDIR/trash" || return 1
+
+    #Only copy again if the source changed
+    cp -u "$KERNEL" "$RESOURCES/${KERNEL##*/}" || return 1
+    cp -u "$FS" "$RESOURCES/${FS##*/}" || return 1
+
+    echo "$RESOURCES/${KERNEL##*/} $RESOURCES/${FS##*/}"
+}
+
+#Create the runtime directory of VM $1, link the kernel ($2) and root
+#filesystem ($3) into it and print its path
+rundir_create() {
+    local ID="$1" KERNEL="$2" FS="$3"
+    local DIR
+
+    DIR="$(mktemp -d "$FC_RUNDIR/vm-$ID.XXXXXX")" || return 1
+
+    #Fall back to symbolic links when the resources were not staged on the
+    #same filesystem
+    ln "$KERNEL" "$DIR/vmlinux" 2> /dev/null || ln -s "$(realpath "$KERNEL")" "$DIR/vmlinux"
+    ln "$FS" "$DIR/rootfs.ext4" 2> /dev/null || ln -s "$(realpath "$FS")" "$DIR/rootfs.ext4"
+
+    echo "$DIR"
+}
+
+#Hand the runtime directory $1 over to the reaper, a rename is cheap compared
+#to removing the files
+rundir_release() {
+    mv "$1" "$FC_RUNDIR/trash/" 2> /dev/null || rm -rf "$1"
+}
+
+#Empty the trash every $1 seconds (default 10), until process $2 exits
+rundir_reaper() {
+    local INTERVAL=${1:-10} PARENT=${2:-$$}
+
+    while kill -0 $PARENT 2> /dev/null; do
+        sleep $INTERVAL
+        find "$FC_RUNDIR/trash" -mindepth 1 -maxdepth 1 -exec rm -rf {} +
+    done
+
+    find "$FC_RUNDIR/trash" -mindepth 1 -maxdepth 1 -exec rm -rf {} +
+}
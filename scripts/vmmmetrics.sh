@@ -0,0 +1,61 @@
+#!/bin/bash
+
+### Functions for the metrics and logs of Firecracker itself. Sourced by
+### launch-firecracker.sh.
+###
+### When FC_VMM_METRICS is set (start.sh -V), every timed microVM gets a
+### metrics FIFO and a log FIFO in $FC_VMM_METRICS, which are configured with
+### the /logger endpoint of the API (log_fifo and metrics_fifo of Firecracker
+### v0.21). The FIFOs are announced on
+### $FC_VMM_METRICS/control.fifo to processing/vmm_metrics.py, a single
+### collector that reads the FIFOs of all VMs.
+
+VMM_METRICS_CONTROL="control.fifo"
+
+vmmmetrics_enabled() {
+    [[ -n "$FC_VMM_METRICS" && -p "$FC_VMM_METRICS/$VMM_METRICS_CONTROL" ]] && return 0 || return 1
+}
+
+#Create the metrics and log FIFO of VM $1, announce them to the collector and
+#print their paths as "metrics log"
+vmmmetrics_create() {
+    local ID="$1"
+    local METRICS="$FC_VMM_METRICS/vm-$ID.metrics"
+    local LOG="$FC_VMM_METRICS/vm-$ID.log"
+
+    rm -f "$METRICS" "$LOG"
+    mkfifo "$METRICS" "$LOG" || return 1
+
+    vmmmetrics_control "add $ID $METRICS $LOG" || return 1
+
+    echo "$METRICS $LOG"
+}
+
+#Write a message to the collector. A single short write, lines of parallel VMs
+#do not mix. Opened read-write, so that it never waits for a reader.
+vmmmetrics_control() {
+    echo "$1" 1<> "$FC_VMM_METRICS/$VMM_METRICS_CONTROL"
+}
+
+#Let Firecracker write its metrics every $1 seconds until it is gone, on its
+#own it only does so every 60 seconds. Only needed for metrics while the VM
+#runs, Firecracker writes them once more when it exits.
+vmmmetrics_flush() {
+    local INTERVAL=$1
+
+    while [[ -S "$fcSock" ]]; do
+        curl_put '/actions' <<EOF 2> /dev/null || return 0
+{
+  "action_type": "FlushMetrics"
+}
+EOF
+        sleep $INTERVAL
+    done
+}
+
+#Tell the collector that Firecracker of VM $1 exited, so that it also writes
+#the summary of a VM that never opened its FIFOs. The collector removes the
+#FIFOs once it read everything.
+vmmmetrics_release() {
+    vmmmetrics_control "release $1"
+}
@@ -1,6 +1,7 @@
 #!/bin/bash
 arch="$(uname -m)"
 rootfsName="rootfs.ext4"
+fastRootfsName="rootfs-fast.ext4"
 writefsName="writedisk.ext4"
 kernelName="vmlinux-$arch"
 
@@ -9,10 +10,12 @@ resourceDir="./resources"
 
 fcDownload="https://github.com/firecracker-microvm/firecracker/releases/download/v0.21.1/firecracker-v0.21.1-$arch"
 
-workloadsFile="${1:-"./parameters/workloads.txt"}"
+workloadsFile="${1:-"./parameters/workloads.manifest"}"
+
+source ./scripts/commands.sh
 
 #Read installed workloads from file to array
-workloads=($(cat $workloadsFile))
+workloads=($(read_workloads $workloadsFile))
 
 echo "Checking if AWS Firecracker is in \$PATH..."
 
@@ -56,8 +59,14 @@ if [[ ! -e "$resourceDir/$rootfsName" ]]; then
     sudo cp ./openrc/init.d/* ./mount/etc/init.d
     sudo cp ./openrc/conf.d/* ./mount/etc/conf.d
 
+    echo "Installing workload manifest..."
+    sudo cp $workloadsFile ./mount/etc/workloads.manifest
+
     echo "Setting up runlevels for workloads..."
     for workload in ${workloads[@]}; do
+        if [[ "$workload" == "-" ]]; then
+            continue
+        fi
         sudo mkdir ./mount/etc/runlevels/$workload
         sudo chmod +x ./mount/etc/runlevels/$workload
 cat <<EOF | sudo chroot ./mount /bin/sh
@@ -88,6 +97,40 @@ else
     echo "Found!"
 fi
 
+echo "Checking if fast-boot root filesystem exists..."
+
+if [[ ! -e "$resourceDir/$fastRootfsName" ]]; then
+    echo "Not found, building..."
+
+    ./scripts/create-root-fs.sh "$fastRootfsName" fast
+
+    echo "Compiling binaries..."
+    make > /dev/null
+
+    echo "Mounting rootfs..."
+
+    mkdir mount
+    sudo mount -t ext4 "$fastRootfsName" mount
+
+    #bin/fast-init is the init, started with init=/bin/fast-init
+    echo "Copying binaries to filesystem..."
+    sudo cp ./bin/* ./mount/bin
+
+    echo "Installing workload manifest..."
+    sudo cp $workloadsFile ./mount/etc/workloads.manifest
+
+    echo "Unmounting..."
+    sudo umount mount
+
+    make clean > /dev/null
+
+    rmdir mount
+
+    mv "$fastRootfsName" "$resourceDir/"
+else
+    echo "Found!"
+fi
+
 echo "Checking if write disk exists..."
 
 if [[ ! -e "$resourceDir/$writefsName" ]]; then
@@ -0,0 +1,190 @@
+/*
+ * Firecracker Microbenchmark
+ * File: fast-init.c
+ *
+ * Minimal init for the fast-boot root filesystem, started by the kernel as
+ * PID 1 with init=/bin/fast-init. It replaces OpenRC and run-workload-reboot:
+ *
+ *  1. mount /proc, /dev, /sys and the write disk on /mnt, bring up loopback
+ *  2. read the workload (softlevel=) and its argument (warg=) from the kernel
+ *     command line, the workload manifest maps the name to its binary
+ *  3. run the workload with /bin/telemetry, which prints the
+ *     WORKLOADTELEMETRY, WORKLOADMETRICS and WORKLOADRUNTIME records
+ *  4. reboot, with reboot=k Firecracker exits right away
+ *
+ * PID 1 must not exit, every error ends in a reboot as well.
+ */
+#include <errno.h>
+#include <fcntl.h>
+#include <net/if.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <time.h>
+#include <unistd.h>
+#include <sys/ioctl.h>
+#include <sys/mount.h>
+#include <sys/reboot.h>
+#include <sys/socket.h>
+#include <sys/stat.h>
+#include <sys/wait.h>
+
+#define NSEC_PER_SEC 1000000000ULL
+#define TELEMETRY "/bin/telemetry"
+#define MANIFEST "/etc/workloads.manifest"
+#define WRITEDISK "/dev/vdb"
+#define NAME_LEN 64
+
+unsigned long long now(void)
+{
+    struct timespec ts;
+    /* The clock of bin/telemetry */
+    clock_gettime(CLOCK_BOOTTIME, &ts);
+    return ts.tv_sec * NSEC_PER_SEC + ts.tv_nsec;
+}
+
+void power_off(void)
+{
+    sync();
+    umount("/mnt");
+    reboot(RB_AUTOBOOT);
+
+    /* Never reached, PID 1 exiting panics the kernel */
+    for (;;)
+        pause();
+}
+
+void mount_fs(const char *source, const char *target, const char *type)
+{
+    mkdir(target, 0755);
+    if (mount(source, target, type, 0, NULL) < 0 && errno != EBUSY)
+        fprintf(stderr, "fast-init: cannot mount %s on %s: %s\n", source,
+                target, strerror(errno));
+}
+
+/* netecho needs the loopback interface, which OpenRC would bring up */
+void loopback_up(void)
+{
+    struct ifreq ifr;
+    int fd = socket(AF_INET, SOCK_DGRAM, 0);
+
+    if (fd < 0)
+        return;
+
+    memset(&ifr, 0, sizeof(ifr));
+    strncpy(ifr.ifr_name, "lo", IFNAMSIZ - 1);
+    if (ioctl(fd, SIOCGIFFLAGS, &ifr) == 0) {
+        ifr.ifr_flags |= IFF_UP | IFF_RUNNING;
+        ioctl(fd, SIOCSIFFLAGS, &ifr);
+    }
+    close(fd);
+}
+
+/* Copy the value of "key=value" on the kernel command line to value */
+int cmdline_value(const char *cmdline, const char *key, char *value, size_t size)
+{
+    size_t key_len = strlen(key);
+    const char *p = cmdline;
+
+    while (*p != '\0') {
+        while (*p == ' ')
+            ++p;
+        if (strncmp(p, key, key_len) == 0 && p[key_len] == '=') {
+            p += key_len + 1;
+            snprintf(value, size, "%.*s", (int)strcspn(p, " \n"), p);
+            return 1;
+        }
+        p += strcspn(p, " ");
+    }
+
+    return 0;
+}
+
+/* Binary of the workload in the manifest, the name itself if not listed */
+void workload_binary(const char *name, char *binary, size_t size)
+{
+    char line[512];
+    char id[NAME_LEN], entry[NAME_LEN], bin[NAME_LEN];
+    FILE *f = fopen(MANIFEST, "r");
+
+    snprintf(binary, size, "%s", name);
+    if (f == NULL)
+        return;
+
+    while (fgets(line, sizeof(line), f) != NULL) {
+        if (line[strspn(line, " \t")] == '#')
+            continue;
+        if (sscanf(line, " %63[^,], %63[^,], %63[^, \n]", id, entry, bin) == 3
+            && strcmp(entry, name) == 0) {
+            snprintf(binary, size, "%s", bin);
+            break;
+        }
+    }
+    fclose(f);
+}
+
+int main(void)
+{
+    char cmdline[4096], name[NAME_LEN], warg[NAME_LEN], binary[NAME_LEN];
+    char boot[32], init[32];
+    ssize_t len;
+    pid_t pid;
+    int fd;
+
+    /* Kernel boot complete, the first instruction of userspace */
+    snprintf(boot, sizeof(boot), "%llu", now());
+
+    mount_fs("proc", "/proc", "proc");
+    mount_fs("devtmpfs", "/dev", "devtmpfs");
+    mount_fs("sysfs", "/sys", "sysfs");
+
+    /* The console of the kernel, the records must reach the serial port */
+    fd = open("/dev/console", O_RDWR);
+    if (fd >= 0) {
+        dup2(fd, STDIN_FILENO);
+        dup2(fd, STDOUT_FILENO);
+        dup2(fd, STDERR_FILENO);
+        if (fd > STDERR_FILENO)
+            close(fd);
+    }
+
+    mkdir("/mnt", 0755);
+    if (mount(WRITEDISK, "/mnt", "ext4", 0, NULL) < 0)
+        fprintf(stderr, "fast-init: cannot mount the write disk: %s\n",
+                strerror(errno));
+    loopback_up();
+    setenv("PATH", "/bin:/sbin:/usr/bin:/usr/sbin", 1);
+
+    fd = open("/proc/cmdline", O_RDONLY);
+    len = fd >= 0 ? read(fd, cmdline, sizeof(cmdline) - 1) : -1;
+    if (fd >= 0)
+        close(fd);
+    cmdline[len > 0 ? len : 0] = '\0';
+
+    if (!cmdline_value(cmdline, "softlevel", name, sizeof(name))
+        || !cmdline_value(cmdline, "warg", warg, sizeof(warg))) {
+        printf("Kernel command line lacks softlevel= or warg=: %s\n", cmdline);
+        power_off();
+    }
+    workload_binary(name, binary, sizeof(binary));
+
+    /* The init system reached the workload */
+    snprintf(init, sizeof(init), "%llu", now());
+
+    pid = fork();
+    if (pid == 0) {
+        execl(TELEMETRY, TELEMETRY, boot, init, binary, warg, (char *)NULL);
+        perror("exec " TELEMETRY);
+        _exit(127);
+    } else if (pid < 0) {
+        perror("fork");
+        power_off();
+    }
+
+    while (waitpid(pid, NULL, 0) < 0 && errno == EINTR)
+        ;
+    fflush(stdout);
+
+    power_off();
+    return 0;
+}
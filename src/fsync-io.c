@@ -0,0 +1,104 @@
+/*
+ * Firecracker Microbenchmark
+ * File: fsync-io.c
+ *
+ * Mixed, fsync-heavy I/O on the write disk (/mnt), resembling a small
+ * database: every transaction writes a random 4 KiB page of a data file and
+ * syncs it, every 4th transaction also appends to a log file, every 8th reads
+ * 64 KiB and every 16th creates, syncs and removes a small file.
+ *
+ * Argument: number of transactions
+ */
+#include <stdio.h>
+#include <stdlib.h> //for atoi
+#include <string.h>
+#include <fcntl.h>
+#include <time.h>
+#include <unistd.h>
+
+#define DIR "/mnt"
+#define PAGE 4096
+#define READ_SIZE (64 * 1024)
+#define DATA_SIZE (16 * 1024 * 1024)
+
+int main(int argc, char **argv)
+{
+    char data_name[64], log_name[64], tmp_name[64];
+    static char page[PAGE], readbuf[READ_SIZE];
+    struct timespec start, end;
+    long i, n, pages = DATA_SIZE / PAGE;
+    int data, log, tmp;
+    double elapsed;
+
+    if(argc > 1)
+        n = atol(argv[1]);
+    else
+        return 1;
+
+    snprintf(data_name, sizeof(data_name), DIR "/fsync-io-%d.data", getpid());
+    snprintf(log_name, sizeof(log_name), DIR "/fsync-io-%d.log", getpid());
+
+    data = open(data_name, O_RDWR | O_CREAT | O_TRUNC, 0644);
+    log = open(log_name, O_WRONLY | O_CREAT | O_TRUNC | O_APPEND, 0644);
+
+    if (data < 0 || log < 0) {
+        perror("open");
+        return 1;
+    }
+
+    if (ftruncate(data, DATA_SIZE) < 0) {
+        perror("ftruncate");
+        return 1;
+    }
+
+    memset(page, 'x', PAGE);
+    srand(getpid());
+    clock_gettime(CLOCK_MONOTONIC, &start);
+
+    for (i = 0; i < n; ++i) {
+        if (pwrite(data, page, PAGE, (rand() % pages) * PAGE) != PAGE) {
+            perror("pwrite");
+            return 1;
+        }
+        fdatasync(data);
+
+        if (i % 4 == 0) {
+            if (write(log, page, 512) != 512) {
+                perror("write");
+                return 1;
+            }
+            fsync(log);
+        }
+
+        if (i % 8 == 0)
+            if (pread(data, readbuf, READ_SIZE, (rand() % (pages - READ_SIZE / PAGE)) * PAGE) < 0)
+                perror("pread");
+
+        if (i % 16 == 0) {
+            snprintf(tmp_name, sizeof(tmp_name), DIR "/fsync-io-%d.%ld", getpid(), i);
+            tmp = open(tmp_name, O_WRONLY | O_CREAT | O_TRUNC, 0644);
+            if (tmp >= 0) {
+                if (write(tmp, page, 512) != 512)
+                    perror("write");
+                fsync(tmp);
+                close(tmp);
+                unlink(tmp_name);
+            }
+        }
+    }
+
+    clock_gettime(CLOCK_MONOTONIC, &end);
+
+    close(data);
+    close(log);
+    unlink(data_name);
+    unlink(log_name);
+
+    elapsed = (end.tv_sec - start.tv_sec) + (end.tv_nsec - start.tv_nsec) / 1e9;
+    printf("transactions = %ld\n", n);
+    printf("transactions/s = %.1f\n", elapsed > 0 ? n / elapsed : 0.0);
+    /* Summary forwarded to the host by bin/telemetry */
+    printf("WORKLOADMETRIC throughput=%.1f\n", elapsed > 0 ? n / elapsed : 0.0);
+
+    return 0;
+}
@@ -0,0 +1,147 @@
+/*
+ * Firecracker Microbenchmark
+ * File: netecho.c
+ *
+ * Network loopback echo: a child process echoes everything it receives on a
+ * TCP connection over 127.0.0.1, the parent sends small messages and waits
+ * for each of them to return.
+ *
+ * Argument: number of round trips, in thousands
+ */
+#include <stdio.h>
+#include <stdlib.h> //for atoi
+#include <string.h>
+#include <time.h>
+#include <unistd.h>
+#include <net/if.h>
+#include <netinet/in.h>
+#include <netinet/tcp.h>
+#include <arpa/inet.h>
+#include <sys/ioctl.h>
+#include <sys/socket.h>
+#include <sys/wait.h>
+
+#define MSG_SIZE 64
+
+/* The guest does not run a network service, bring the loopback up ourselves */
+void loopback_up(int sock)
+{
+    struct ifreq ifr;
+
+    memset(&ifr, 0, sizeof(ifr));
+    strncpy(ifr.ifr_name, "lo", IFNAMSIZ - 1);
+
+    if (ioctl(sock, SIOCGIFFLAGS, &ifr) < 0)
+        return;
+
+    if (!(ifr.ifr_flags & IFF_UP)) {
+        ifr.ifr_flags |= IFF_UP;
+        ioctl(sock, SIOCSIFFLAGS, &ifr);
+    }
+}
+
+/* Read exactly n bytes, returns 0 on success */
+int read_full(int fd, char *buf, int n)
+{
+    int r, done = 0;
+
+    while (done < n) {
+        r = read(fd, buf + done, n - done);
+        if (r <= 0)
+            return 1;
+        done += r;
+    }
+    return 0;
+}
+
+void echo_server(int listener)
+{
+    char buf[MSG_SIZE];
+    int conn = accept(listener, NULL, NULL);
+
+    if (conn < 0)
+        _exit(1);
+
+    while (read_full(conn, buf, MSG_SIZE) == 0)
+        if (write(conn, buf, MSG_SIZE) != MSG_SIZE)
+            break;
+
+    close(conn);
+    _exit(0);
+}
+
+int main(int argc, char **argv)
+{
+    struct sockaddr_in addr;
+    socklen_t addrlen = sizeof(addr);
+    struct timespec start, end;
+    char buf[MSG_SIZE];
+    long i, n;
+    int listener, conn, one = 1;
+    double elapsed;
+    pid_t pid;
+
+    if(argc > 1)
+        n = atol(argv[1]) * 1000;
+    else
+        return 1;
+
+    listener = socket(AF_INET, SOCK_STREAM, 0);
+    if (listener < 0) {
+        perror("socket");
+        return 1;
+    }
+    loopback_up(listener);
+
+    memset(&addr, 0, sizeof(addr));
+    addr.sin_family = AF_INET;
+    addr.sin_addr.s_addr = htonl(INADDR_LOOPBACK);
+    addr.sin_port = 0;
+
+    if (bind(listener, (struct sockaddr *) &addr, sizeof(addr)) < 0
+        || listen(listener, 1) < 0
+        || getsockname(listener, (struct sockaddr *) &addr, &addrlen) < 0) {
+        perror("bind");
+        return 1;
+    }
+
+    pid = fork();
+    if (pid < 0) {
+        perror("fork");
+        return 1;
+    } else if (pid == 0) {
+        echo_server(listener);
+    }
+    close(listener);
+
+    conn = socket(AF_INET, SOCK_STREAM, 0);
+    if (conn < 0 || connect(conn, (struct sockaddr *) &addr, sizeof(addr)) < 0) {
+        perror("connect");
+        return 1;
+    }
+    /* Every message is a round trip, do not let Nagle batch them */
+    setsockopt(conn, IPPROTO_TCP, TCP_NODELAY, &one, sizeof(one));
+
+    memset(buf, 'x', MSG_SIZE);
+    clock_gettime(CLOCK_MONOTONIC, &start);
+
+    for (i = 0; i < n; ++i) {
+        if (write(conn, buf, MSG_SIZE) != MSG_SIZE || read_full(conn, buf, MSG_SIZE)) {
+            perror("echo");
+            return 1;
+        }
+    }
+
+    clock_gettime(CLOCK_MONOTONIC, &end);
+    close(conn);
+    waitpid(pid, NULL, 0);
+
+    elapsed = (end.tv_sec - start.tv_sec) * 1e9 + (end.tv_nsec - start.tv_nsec);
+    printf("round trips = %ld\n", n);
+    printf("avg latency ns = %.1f\n", n > 0 ? elapsed / n : 0.0);
+    /* Summary forwarded to the host by bin/telemetry */
+    printf("WORKLOADMETRIC latency=%.1f\n", n > 0 ? elapsed / n : 0.0);
+    printf("WORKLOADMETRIC throughput=%.1f\n", elapsed > 0 ? n / (elapsed / 1e9) : 0.0);
+
+    return 0;
+}
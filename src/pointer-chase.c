@@ -0,0 +1,89 @@
+/*
+ * Firecracker Microbenchmark
+ * File: pointer-chase.c
+ *
+ * Memory latency: follow a random cyclic chain of pointers through a working
+ * set that is much larger than the last level cache. Every load depends on the
+ * previous one, so the runtime is dominated by the memory latency.
+ *
+ * Argument: number of loads, in millions
+ */
+#include <stdio.h>
+#include <stdlib.h> //for atoi
+#include <time.h>
+
+/* 64 MiB, fits in the 128 MiB of the microVM next to the guest itself */
+#define WORKING_SET (64 * 1024 * 1024)
+/* One node per cache line */
+#define LINE 64
+
+struct node {
+    struct node *next;
+    char pad[LINE - sizeof(struct node *)];
+};
+
+/* xorshift, rand() has a too small range on some libcs */
+static unsigned long long state = 88172645463325252ULL;
+
+unsigned long long next_random(void)
+{
+    state ^= state << 13;
+    state ^= state >> 7;
+    state ^= state << 17;
+    return state;
+}
+
+int main(int argc, char **argv)
+{
+    struct node *nodes, *p;
+    struct timespec start, end;
+    long i, j, n, loads;
+    long *order;
+    long tmp;
+    double elapsed;
+
+    if(argc > 1)
+        loads = atol(argv[1]) * 1000000;
+    else
+        return 1;
+
+    n = WORKING_SET / sizeof(struct node);
+    nodes = malloc(n * sizeof(struct node));
+    order = malloc(n * sizeof(long));
+
+    if (nodes == NULL || order == NULL) {
+        perror("malloc");
+        return 1;
+    }
+
+    /* Sattolo's algorithm gives a single cycle through all nodes */
+    for (i = 0; i < n; ++i)
+        order[i] = i;
+    for (i = n - 1; i > 0; --i) {
+        j = next_random() % i;
+        tmp = order[i];
+        order[i] = order[j];
+        order[j] = tmp;
+    }
+    for (i = 0; i < n; ++i)
+        nodes[order[i]].next = &nodes[order[(i + 1) % n]];
+    free(order);
+
+    p = &nodes[0];
+    clock_gettime(CLOCK_MONOTONIC, &start);
+
+    for (i = 0; i < loads; ++i)
+        p = p->next;
+
+    clock_gettime(CLOCK_MONOTONIC, &end);
+
+    elapsed = (end.tv_sec - start.tv_sec) * 1e9 + (end.tv_nsec - start.tv_nsec);
+    /* Print p, otherwise the chase may be optimised away */
+    printf("loads = %ld (end %p)\n", loads, (void *) p);
+    printf("avg latency ns = %.2f\n", loads > 0 ? elapsed / loads : 0.0);
+    /* Summary forwarded to the host by bin/telemetry */
+    printf("WORKLOADMETRIC latency=%.2f\n", loads > 0 ? elapsed / loads : 0.0);
+
+    free(nodes);
+    return 0;
+}
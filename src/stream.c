@@ -387,6 +387,8 @@ main(int argc, char **argv)
 	       maxtime[j]);
     }
     printf(HLINE);
+    /* Summary forwarded to the host by bin/telemetry: best Triad rate */
+    printf("WORKLOADMETRIC bandwidth=%.1f\n", 1.0E-06 * bytes[3]/mintime[3]);
 
     /* --- Check Results --- */
     checkSTREAMresults();
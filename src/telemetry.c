@@ -0,0 +1,133 @@
+/*
+ * Firecracker Microbenchmark
+ * File: telemetry.c
+ *
+ * Timing helper for inside the microVM. All timestamps are CLOCK_BOOTTIME in
+ * nanoseconds, which starts at (roughly) zero when the guest kernel boots.
+ * Timestamps taken by the init system with "telemetry now" share its base.
+ *
+ * Usage:
+ *  telemetry now
+ *      Print the current timestamp.
+ *  telemetry <boot timestamp> <init timestamp> <workload> [arguments...]
+ *      Run the workload, dump its regular output and print a record to the
+ *      console:
+ *
+ *      WORKLOADTELEMETRY boot=<ns> init=<ns> start=<ns> end=<ns> cpu=<ns> status=<int>
+ *      WORKLOADMETRICS <name>=<value> ...
+ *      WORKLOADRUNTIME <ms>
+ *
+ *      boot:   kernel boot complete, i.e. the first thing userspace init did,
+ *              as passed by the caller
+ *      init:   the init system reached the workload, as passed by the caller
+ *      start:  right before the workload is executed
+ *      end:    right after the workload exited
+ *      cpu:    user and system time used by the workload
+ *      status: exit status of the workload
+ *
+ *      WORKLOADMETRICS collects the "WORKLOADMETRIC <name>=<value>" lines the
+ *      workload printed, e.g. its bandwidth in MB/s. It is omitted if there
+ *      are none.
+ */
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <time.h>
+#include <unistd.h>
+#include <sys/time.h>
+#include <sys/resource.h>
+#include <sys/wait.h>
+
+#define NSEC_PER_SEC 1000000000ULL
+#define METRIC_PREFIX "WORKLOADMETRIC "
+#define MAX_METRICS 512
+
+unsigned long long now(void)
+{
+    struct timespec ts;
+    clock_gettime(CLOCK_BOOTTIME, &ts);
+    return ts.tv_sec * NSEC_PER_SEC + ts.tv_nsec;
+}
+
+unsigned long long timeval_ns(struct timeval tv)
+{
+    return tv.tv_sec * NSEC_PER_SEC + tv.tv_usec * 1000ULL;
+}
+
+int main(int argc, char **argv)
+{
+    unsigned long long init, start, end, boot;
+    struct rusage usage;
+    int status = 0;
+    int out[2];
+    char line[256];
+    char metrics[MAX_METRICS] = "";
+    size_t len;
+    FILE *output;
+    pid_t pid;
+
+    if (argc == 2 && strcmp(argv[1], "now") == 0) {
+        printf("%llu\n", now());
+        return 0;
+    }
+
+    if (argc < 4) {
+        fprintf(stderr, "Usage: %s now | <boot timestamp> <init timestamp> <workload> [arguments...]\n", argv[0]);
+        return 1;
+    }
+
+    boot = strtoull(argv[1], NULL, 10);
+    init = strtoull(argv[2], NULL, 10);
+
+    if (pipe(out) < 0) {
+        perror("pipe");
+        return 1;
+    }
+
+    start = now();
+    pid = fork();
+
+    if (pid < 0) {
+        perror("fork");
+        return 1;
+    } else if (pid == 0) {
+        dup2(out[1], STDOUT_FILENO);
+        close(out[0]);
+        close(out[1]);
+        execvp(argv[3], argv + 3);
+        perror("exec");
+        _exit(127);
+    }
+
+    /* Keep the metrics of the workload, dump the rest of its output */
+    close(out[1]);
+    output = fdopen(out[0], "r");
+    while (output != NULL && fgets(line, sizeof(line), output) != NULL) {
+        if (strncmp(line, METRIC_PREFIX, strlen(METRIC_PREFIX)) != 0)
+            continue;
+
+        line[strcspn(line, "\r\n")] = '\0';
+        len = strlen(metrics);
+        snprintf(metrics + len, sizeof(metrics) - len, "%s%s",
+                 len > 0 ? " " : "", line + strlen(METRIC_PREFIX));
+    }
+    if (output != NULL)
+        fclose(output);
+
+    if (wait4(pid, &status, 0, &usage) < 0) {
+        perror("wait4");
+        return 1;
+    }
+    end = now();
+
+    printf("WORKLOADTELEMETRY boot=%llu init=%llu start=%llu end=%llu cpu=%llu status=%d\n",
+           boot, init, start, end,
+           timeval_ns(usage.ru_utime) + timeval_ns(usage.ru_stime),
+           WIFEXITED(status) ? WEXITSTATUS(status) : -1);
+    if (metrics[0] != '\0')
+        printf("WORKLOADMETRICS %s\n", metrics);
+    printf("WORKLOADRUNTIME %llu\n", (end - start) / 1000000ULL);
+    fflush(stdout);
+
+    return 0;
+}
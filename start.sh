@@ -7,16 +7,31 @@
 ###     2020 (c)
 
 #Modes accepted by this script
-declare -a modes=( "benchmark" "baseline" "interactive")
+declare -a modes=( "benchmark" "baseline" "interactive" "sweep" )
 arch="$(uname -m)"
 kernelLoc="./resources/vmlinux-${arch}"
 fsLoc="./resources/rootfs.ext4"
-wlLoc="./parameters/workloads.txt"
+fastFsLoc="./resources/rootfs-fast.ext4"
+fastInit=""
+fsGiven=0
+wlLoc="./parameters/workloads.manifest"
 waLoc="./workloads/benchmark-arguments.txt"
 mode=${modes[0]}
 num=10
 usePoisson=0
+baselineJobs=1
+baselineCI=0
+declare -a placements=( "none" "roundrobin" "packed" "numa" )
+placement=""
+cpuMax="max 100000"
+memMax="max"
+runDir=""
 SYSMON_location="./processing/machine_monitor.py"
+METRICS_location="./processing/live_metrics.py"
+SWEEP_location="./processing/saturation_sweep.py"
+VMM_location="./processing/vmm_metrics.py"
+metricsListen=""
+vmmMetrics=""
 
 which firecracker > /dev/null
 
@@ -27,7 +42,7 @@ fi
 
 
 usage() {
-    echo "Usage: ${0##*/} [-k <string>] [-f <string>] [-m <string>] [-w <string>] [-n <int>] [-a <string>] [-h]" 1>&2
+    echo "Usage: ${0##*/} [-k <string>] [-f <string>] [-m <string>] [-w <string>] [-n <int>] [-a <string>] [-j <int>] [-e <float>] [-P <string>] [-C <string>] [-M <string>] [-T <string>] [-L <string>] [-V <string>] [-b] [-h] [-- <sweep arguments>]" 1>&2
 }
 
 help() {
@@ -36,11 +51,22 @@ help() {
     echo "  -k  File location       Location of the kernel to be used, default: $kernelLoc" 1>&2
     echo "  -f  File location       Location of the root filesystem, default: $fsLoc" 1>&2
     echo "  -m  Mode                Mode to run, can be \"${modes[@]}\", default: $mode" 1>&2
-    echo "  -w  File location       Location of the workloads.txt file, default: $wlLoc" 1>&2
+    echo "  -w  File location       Location of the workload manifest, default: $wlLoc" 1>&2
     echo "  -n  Instances           Number of instances to run maximally, default: $num" 1>&2
     echo "  -a  File location       File locations of the workload arguments, no default." 1>&2
     echo "  -p                      Toggle usage of poisson timings incorporated in workload arugments file." 1>&2
+    echo "  -j  Jobs                Baseline: number of pairs run in parallel, each pinned to a core, default: $baselineJobs" 1>&2
+    echo "  -e  Fraction            Baseline: stop a pair once its 95% confidence interval is within this fraction of the mean, 0 disables, default: $baselineCI" 1>&2
+    echo "  -P  Policy              Place every microVM in its own cgroup, policy can be \"${placements[@]}\", default: no cgroups" 1>&2
+    echo "  -C  Quota               cpu.max of every microVM cgroup, default: \"$cpuMax\"" 1>&2
+    echo "  -M  Bytes               memory.max of every microVM cgroup, default: $memMax" 1>&2
+    echo "  -T  Directory           Give every timed microVM its own runtime directory in this (tmpfs) directory, e.g. /dev/shm/fc-microbenchmark, default: sockets in /tmp" 1>&2
+    echo "  -L  Port or socket      Benchmark: serve live metrics in the Prometheus format on this localhost port or Unix socket, default: off" 1>&2
+    echo "  -V  Directory           Benchmark: collect the metrics and logs of Firecracker of every microVM through FIFOs in this directory, default: off" 1>&2
+    echo "  -b                      Boot the fast-boot root filesystem, which runs the workload from a minimal init rather than OpenRC, default -f: $fastFsLoc" 1>&2
     echo "  -h                      Display this" 1>&2
+    echo "Sweep mode searches the maximal sustainable arrival rate, arguments after -- are passed to $SWEEP_location," 1>&2
+    echo "which requires at least a baseline file: ${0##*/} -m sweep -- -b <baselines.txt> [-x <mix>] [-s <scheduler>]" 1>&2
     exit 1
 }
 
@@ -55,7 +81,7 @@ ensure_pipenv() {
 
 #Parse the arguments
 
-while getopts ":k:f:m:w:n:a:hp" o; do
+while getopts ":k:f:m:w:n:a:j:e:P:C:M:T:L:V:bhp" o; do
     case $o in
         k )
             kernelLoc=$OPTARG
@@ -66,6 +92,7 @@ while getopts ":k:f:m:w:n:a:hp" o; do
             ;;
         f )
             fsLoc=$OPTARG
+            fsGiven=1
             if [[ ! -e $fsLoc ]]; then
                 echo "$fsLoc does not exist!" 1>&2
                 exit 1
@@ -95,6 +122,42 @@ while getopts ":k:f:m:w:n:a:hp" o; do
                 exit 1
             fi
             ;;
+        j )
+            baselineJobs=$OPTARG
+            if [[ $baselineJobs -lt 1 ]]; then
+                echo "-j requires a number greater than 0, got $baselineJobs" 1>&2
+                exit 1
+            fi
+            ;;
+        e )
+            baselineCI=$OPTARG
+            ;;
+        P )
+            placement=$OPTARG
+            if [[ ! " ${placements[@]} " =~ " $placement " ]]; then
+                echo "$placement is an invalid placement policy." 1>&2
+                echo "Use one of these: ${placements[@]}" 1>&2
+                exit 1
+            fi
+            ;;
+        C )
+            cpuMax=$OPTARG
+            ;;
+        M )
+            memMax=$OPTARG
+            ;;
+        T )
+            runDir=$OPTARG
+            ;;
+        L )
+            metricsListen=$OPTARG
+            ;;
+        V )
+            vmmMetrics=$OPTARG
+            ;;
+        b )
+            fastInit="/bin/fast-init"
+            ;;
         h )
             help
             exit 1
@@ -115,6 +178,23 @@ while getopts ":k:f:m:w:n:a:hp" o; do
     esac
 done
 
+#Arguments after -- are passed on, for sweep mode
+shift $((OPTIND - 1))
+
+if [[ -n "$fastInit" ]]; then
+    #Unless another root filesystem was given with -f
+    if [[ $fsGiven -eq 0 ]]; then
+        fsLoc=$fastFsLoc
+    fi
+
+    if [[ ! -e $fsLoc ]]; then
+        echo "$fsLoc does not exist, please run ./setup.sh" 1>&2
+        exit 1
+    fi
+
+    export FC_FAST_INIT=$fastInit
+fi
+
 #Determine the mode and whether it is valid
 if [[ ! " ${modes[@]} " =~ " $mode " ]]; then
     echo "$mode is an invalid runmode." 1>&2
@@ -169,6 +249,45 @@ echo "4194303" | sudo tee /proc/sys/kernel/pid_max > /dev/null
 
 echo "Raising user limits..." 1>&2
 
+if [[ -n "$placement" ]]; then
+    echo "Setting up cgroups for placement policy $placement..." 1>&2
+
+    source ./scripts/commands.sh
+    source ./scripts/cgroup.sh
+
+    export FC_PLACEMENT=$placement
+    export FC_CPU_MAX=$cpuMax
+    export FC_MEM_MAX=$memMax
+
+    cgroup_init
+
+    if [[ $? -ne 0 ]]; then
+        echo "Could not set up cgroups, exiting..." 1>&2
+        exit 1
+    fi
+fi
+
+if [[ -n "$runDir" ]]; then
+    echo "Staging kernel and root filesystem in $runDir..." 1>&2
+
+    source ./scripts/rundir.sh
+
+    export FC_RUNDIR=$runDir
+
+    staged=( $(rundir_init $kernelLoc $fsLoc) )
+
+    if [[ $? -ne 0 ]]; then
+        echo "Could not stage in $runDir, exiting..." 1>&2
+        exit 1
+    fi
+
+    kernelLoc=${staged[0]}
+    fsLoc=${staged[1]}
+
+    #Remove the runtime directories of finished VMs in batches
+    rundir_reaper 10 $$ &
+fi
+
 if [[ $mode -eq 0 ]]; then
     #benchmark
 
@@ -197,18 +316,61 @@ if [[ $mode -eq 0 ]]; then
     #sleep for 1 sec after, to ensure it has a 0 measurement on the first line
     sleep 1.0s
 
+    if [[ -n "$metricsListen" ]]; then
+        export FC_METRICS_FIFO="/tmp/fc-metrics-$$.fifo"
+        mkfifo $FC_METRICS_FIFO
+
+        (python3 $METRICS_location -f $FC_METRICS_FIFO -l $metricsListen ) &
+
+        METRICS_PID=$!
+        #benchmark.sh stops reporting when the exporter is gone, e.g. when
+        #the port is in use
+        export FC_METRICS_PID=$METRICS_PID
+    fi
+
+    if [[ -n "$vmmMetrics" ]]; then
+        #One collector reads the metrics FIFOs of all microVMs
+        export FC_VMM_METRICS=$vmmMetrics
+        VMM_OUTPUT="./results/vmm-${waLoc##*/}"
+        mkdir -p $FC_VMM_METRICS
+        [[ -p $FC_VMM_METRICS/control.fifo ]] || mkfifo $FC_VMM_METRICS/control.fifo
+        #Keep the control FIFO open, so that announcements of the first VMs
+        #are kept until the collector opened it
+        exec {vmmControlFd}<> $FC_VMM_METRICS/control.fifo
+
+        (python3 $VMM_location -d $FC_VMM_METRICS -o $VMM_OUTPUT ) &
+
+        VMM_PID=$!
+    fi
+
     echo "Starting benchmark..." 1>&2
 
     ./scripts/benchmark.sh $kernelLoc $fsLoc $wlLoc $num $waLoc $usePoisson
 
     kill -2 $SYSMON_PID
+
+    if [[ -n "$metricsListen" ]]; then
+        kill -2 $METRICS_PID
+        rm -f $FC_METRICS_FIFO
+    fi
+
+    if [[ -n "$vmmMetrics" ]]; then
+        kill -2 $VMM_PID
+        wait $VMM_PID
+        exec {vmmControlFd}>&-
+        rm -f $FC_VMM_METRICS/control.fifo
+    fi
 elif [[ $mode -eq 1 ]]; then
     #baseline
     echo "Determining baseline execution times..." 1>&2
-    ./scripts/baseline.sh $kernelLoc $fsLoc $wlLoc $num $waLoc
+    ./scripts/baseline.sh $kernelLoc $fsLoc $wlLoc $num $waLoc $baselineJobs $baselineCI
 elif [[ $mode -eq 2 ]]; then
     #interactive
     ./scripts/launch-firecracker.sh $kernelLoc $fsLoc 1 default 0 v
+elif [[ $mode -eq 3 ]]; then
+    #sweep
+    echo "Searching the saturation point..." 1>&2
+    python3 $SWEEP_location -k $kernelLoc -f $fsLoc -w $wlLoc -n $num "$@"
 else
     #Fall-through
     exit 1
@@ -0,0 +1,162 @@
+import argparse
+import sys
+from os import path
+
+_PRDSCR_ = """Workload registry of fc-microbenchmark
+
+Reads the workload manifest, which declares for every workload its ID, name,
+binary, resource class and argument schema.
+
+The registry can print the baseline-argument file for (a subset of) the
+workloads, or list the workloads.
+"""
+
+MY_LOCATION = path.dirname(path.abspath(__file__))
+
+DEFAULT_MANIFEST = path.abspath(path.join(MY_LOCATION, "../parameters/workloads.manifest"))
+RESOURCE_CLASSES = ("cpu", "mem", "io", "net")
+
+#Columns of the manifest, in order
+FIELDS = ("id", "name", "binary", "class", "argument", "min", "max", "baseline")
+
+
+def parse_manifest(raw: list) -> dict:
+    """Parse the lines of a manifest into a dictionary with the workload ID as
+    key. Every workload is a dictionary with the keys of FIELDS.
+
+    """
+    registry = {}
+
+    for line in raw:
+        line = line.strip()
+        #Skip comments and empty lines
+        if not line or line.startswith("#"):
+            continue
+
+        split = [s.strip() for s in line.split(",")]
+
+        if len(split) != len(FIELDS):
+            raise ValueError("parse_manifest: expected {} columns, got {}: {}".format(len(FIELDS), len(split), line))
+
+        workload = dict(zip(FIELDS, split))
+        workload["id"] = int(workload["id"])
+        workload["min"] = int(workload["min"])
+        workload["max"] = int(workload["max"])
+        workload["baseline"] = [int(b) for b in workload["baseline"].split()]
+
+        if workload["class"] not in RESOURCE_CLASSES:
+            raise ValueError("parse_manifest: {} has an unknown class {}".format(workload["name"], workload["class"]))
+
+        if workload["id"] in registry:
+            raise ValueError("parse_manifest: ID {} is used twice".format(workload["id"]))
+
+        for argument in workload["baseline"]:
+            if not valid_argument(workload, argument):
+                raise ValueError("parse_manifest: baseline argument {} of {} is out of range".format(argument, workload["name"]))
+
+        registry[workload["id"]] = workload
+
+    return registry
+
+
+def read_manifest(filename: str = DEFAULT_MANIFEST) -> dict:
+    if type(filename) is not str:
+        raise TypeError("read_manifest: argument is of invalid type, must be string")
+
+    if not path.isfile(filename):
+        raise ValueError("read_manifest: given filename ({}) does not exist, or is not a file!".format(filename))
+
+    with open(filename, "r") as f:
+        return parse_manifest(f.readlines())
+
+
+def valid_argument(workload: dict, argument: int) -> bool:
+    return workload["min"] <= argument <= workload["max"]
+
+
+def find_workloads(registry: dict, selector: str) -> list:
+    """Return the IDs of the workloads a selector refers to. A selector is
+    either a workload ID, a workload name or a resource class.
+
+    """
+    if selector.isnumeric() and int(selector) in registry:
+        return [int(selector)]
+
+    for wid, workload in registry.items():
+        if workload["name"] == selector:
+            return [wid]
+
+    if selector in RESOURCE_CLASSES:
+        return sorted([wid for wid, w in registry.items() if w["class"] == selector])
+
+    raise ValueError("find_workloads: {} is not a workload or resource class".format(selector))
+
+
+def baseline_arguments(registry: dict, selectors: list = None) -> dict:
+    """Return the baselined arguments per workload ID, in the same format as
+    parse_baseline_arguments of the workload generator. If selectors are given,
+    only return those workloads.
+
+    """
+    ids = sorted(registry.keys())
+    selectors = selectors or []
+
+    if selectors:
+        ids = sorted(set(wid for s in selectors for wid in find_workloads(registry, s)))
+
+    return {wid: list(registry[wid]["baseline"]) for wid in ids}
+
+
+def workload_label(registry: dict, wid: int, argument=None) -> str:
+    """Human readable label of a workload (and argument), for graphs and
+    processed results. Falls back to the ID for unknown workloads.
+
+    """
+    workload = registry.get(wid)
+
+    if workload is None:
+        label = "workload {}".format(wid)
+    else:
+        label = workload["name"]
+
+    if argument is not None:
+        label = "{} {}".format(label, argument)
+
+    return label
+
+
+def workload_class(registry: dict, wid: int) -> str:
+    return registry.get(wid, {}).get("class", "")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=_PRDSCR_)
+
+    arg_parser.add_argument("command", type=str, choices=["baseline-arguments", "list", "names"],
+                            help="baseline-arguments: print a baseline-argument file, list: describe the workloads, names: print the names ordered by ID")
+    arg_parser.add_argument("selectors", type=str, nargs="*", help="Only include these workload IDs, names or resource classes")
+    arg_parser.add_argument("-m", "--manifest", type=str, help="Filename of the workload manifest", default=DEFAULT_MANIFEST)
+    arg_parser.add_argument("-o", "--output", type=str, help="If specified, write output to filename, rather than stdout.")
+
+    args = arg_parser.parse_args()
+
+    registry = read_manifest(args.manifest)
+    output = []
+
+    if args.command == "baseline-arguments":
+        for wid, arguments in baseline_arguments(registry, args.selectors).items():
+            output += ["{}, {}\n".format(wid, a) for a in arguments]
+    elif args.command == "list":
+        for wid in baseline_arguments(registry, args.selectors).keys():
+            w = registry[wid]
+            output.append("{}\t{}\t{}\t{} [{}, {}]\n".format(wid, w["name"], w["class"], w["argument"], w["min"], w["max"]))
+    else:
+        #IDs without workload get an empty line, the line number is the ID
+        for wid in range(0, max(registry.keys()) + 1):
+            output.append(registry.get(wid, {}).get("name", "") + "\n")
+
+    if args.output:
+        with open(args.output, "w") as out:
+            out.writelines(output)
+    else:
+        sys.stdout.writelines(output)
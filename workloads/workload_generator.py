@@ -3,22 +3,26 @@ import sys
 from os import path
 import numpy as np
 
+from registry import DEFAULT_MANIFEST, read_manifest, find_workloads, baseline_arguments
+
 _PRDSCR_ = """Workload-generator for fc-microbenchmark
 
 This program generates a workload-argument file that will be executed by the benchmark.
 
-It reads from a baseline-argument textfile to determine which pairs of workloads and arguments are baselined.
+It reads from a baseline-argument textfile, or the workload manifest, to determine which pairs of workloads and arguments are baselined.
 From here, it will generate a text-file that contains N entries, with a specified mix.
 
-This program does not check whether the id of the workloads (first column in the baseline-argument file) are valid.
+The mix is either a list of weights in the order of the workload IDs in the baseline-argument file (e.g. 1/1/1), where
+IDs without a weight are left out, or names workloads and resource classes of the manifest (e.g. cpu=2/stream=1). The weight of a class is divided equally over its workloads.
 """
 
 #Random number generator needed for some Numpy-functions
 rng = np.random.default_rng()
 
-def parse_mix(raw: str) -> list:
+def parse_mix(raw: str, length: int = 0) -> list:
     """Parse a raw string that indicates a mix into a list. For example, 
-    "3/2/1" will be converted to [0.5, 0.333, 0.166]
+    "3/2/1" will be converted to [0.5, 0.333, 0.166]. The mix is padded
+    with zero weights up to length, for workload IDs without a weight.
 
     """
     if type(raw) is not str:
@@ -31,9 +35,45 @@ def parse_mix(raw: str) -> list:
 
     total = sum(splits)
 
+    #Workload IDs without a weight are never selected
+    splits += [0] * (length - len(splits))
+
     #Convert to fraction
     return [(split / total) for split in splits]
 
+def parse_named_mix(raw: str, registry: dict, wid_args: dict) -> tuple:
+    """Parse a raw string that names workloads or resource classes of the
+    registry, for example "cpu=3/mem=1". Returns the baselined arguments of the
+    selected workloads and the mix, in the same order.
+
+    """
+    if type(raw) is not str:
+        raise TypeError("parse_named_mix: argument is of invalid type, must be string")
+
+    weights = {}
+
+    for part in raw.split("/"):
+        selector, _, weight = part.partition("=")
+
+        if not weight.strip().isnumeric():
+            raise ValueError("parse_named_mix: {} has no numeric weight".format(part))
+
+        #Only workloads that are baselined can be selected
+        ids = [wid for wid in find_workloads(registry, selector.strip()) if wid in wid_args]
+
+        if not ids:
+            raise ValueError("parse_named_mix: {} has no baselined workloads".format(selector))
+
+        for wid in ids:
+            weights[wid] = weights.get(wid, 0) + int(weight) / len(ids)
+
+    total = sum(weights.values())
+
+    selected_args = {wid: wid_args[wid] for wid in weights.keys()}
+    mix = [(weights[wid] / total) for wid in selected_args.keys()]
+
+    return selected_args, mix
+
 def parse_baseline_arguments(raw: list) -> dict:
     ret_dict = {}
 
@@ -110,9 +150,10 @@ def generate_poisson_workload(wid_args: dict, mix: list, n: int, t: float) -> li
 if __name__ == "__main__":
     arg_parser = argparse.ArgumentParser(description=_PRDSCR_)
 
-    arg_parser.add_argument("baseline", type=str, help="Filename of the baseline-argument text file", default="baseline-arguments.txt")
+    arg_parser.add_argument("baseline", type=str, help="Filename of the baseline-argument text file, or of the workload manifest", default="baseline-arguments.txt")
     arg_parser.add_argument("N", type=int, help="Number of entries in the to be generated workload-argument file.", default=5000)
-    arg_parser.add_argument("mix", type=str, help="Mixture of workloads, e.g. 1/1/1", default="1/1/1")
+    arg_parser.add_argument("mix", type=str, help="Mixture of workloads, e.g. 1/1/1 or cpu=2/stream=1", default="1/1/1")
+    arg_parser.add_argument("-m", "--manifest", type=str, help="Filename of the workload manifest, used for named mixes and to check the workload IDs.", default=DEFAULT_MANIFEST)
     arg_parser.add_argument("-p", "--poisson", dest="poisson", type=float, help="If parameteris specified, the float number provided in addition to parameter will be used as time in hours.", default=False)
     arg_parser.add_argument("-o", "--output", type=str, help="If specified, write output to filename, rather than stdout.")
 
@@ -122,12 +163,23 @@ if __name__ == "__main__":
 
     args = arg_parser.parse_args()
 
-    baseline_arguments_file = read_file(args.baseline)
     n = args.N
-    mix = parse_mix(args.mix)
+    registry = read_manifest(args.manifest)
 
     #Get the dictionary with workload IDs and corresponding arguments
-    valid_id_arguments = parse_baseline_arguments(baseline_arguments_file)
+    if args.baseline.endswith(".manifest"):
+        valid_id_arguments = baseline_arguments(read_manifest(args.baseline))
+    else:
+        valid_id_arguments = parse_baseline_arguments(read_file(args.baseline))
+
+    for wid in valid_id_arguments.keys():
+        if wid not in registry:
+            print("Workload ID {} is not in the manifest {}".format(wid, args.manifest), file=sys.stderr)
+
+    if "=" in args.mix:
+        valid_id_arguments, mix = parse_named_mix(args.mix, registry, valid_id_arguments)
+    else:
+        mix = parse_mix(args.mix, len(valid_id_arguments))
 
     if len(valid_id_arguments) != len(mix):
         print("The mix contains {} values, but there are {} workload IDs!".format(len(mix), len(valid_id_arguments)))